@@ -0,0 +1,59 @@
+"""
+Gunicorn settings for the web process (see Procfile).
+
+The app is loaded once in the master (``preload_app``) and the workers are
+forked from it, so Django setup, URL resolution and template compilation
+(library.startup.warm_up) are paid once per dyno rather than once per
+worker, and forked workers share those pages copy-on-write. Workers run
+the ASGI app under uvicorn so the dashboard event stream does not tie up
+a worker per open browser tab.
+
+Boot times are logged: the master once the app is loaded, and each worker
+once it is ready to accept requests.
+"""
+
+import os
+import time
+
+
+CONFIG_LOADED = time.monotonic()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'uvicorn_worker.UvicornWorker'
+preload_app = True
+
+# Heroku's router gives up after 30s; stop a stuck worker just before that.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 28))
+graceful_timeout = 20
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot grow without bound;
+# the jitter keeps them from all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    from library.checks import events_cache_warnings
+
+    for warning in events_cache_warnings(server.cfg.workers):
+        server.log.warning("%s %s", warning.msg, warning.hint)
+    server.log.info("Master ready in %.0f ms (app preloaded)", (time.monotonic() - CONFIG_LOADED) * 1000)
+
+
+def post_fork(server, worker):
+    # warm_up() opens no database connections, but anything else that did
+    # before the fork must not be shared between processes.
+    from django.db import connections
+
+    connections.close_all()
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s booted in %.0f ms", worker.pid, (time.monotonic() - worker.forked_at) * 1000)
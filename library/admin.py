@@ -1,7 +1,140 @@
 from django.contrib import admin
-from .models import Book, Student, Issue, BorrowRequest
+from .branches import refresh_book_totals
+from .models import (
+    Book, Branch, BranchStock, Student, Issue, BorrowRequest, IssueArchive, Job, ReminderLog, CirculationEvent,
+    BookRecommendation
+)
+from .paginators import EstimatedCountPaginator
 
-admin.site.register(Book)
-admin.site.register(Student)
-admin.site.register(Issue)
-admin.site.register(BorrowRequest)
\ No newline at end of file
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Estimated totals instead of COUNT(*) over millions of rows, and no
+    # second count for the "N total" link next to filtered results.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ['name', 'code']
+    search_fields = ['name', 'code']
+
+
+class BranchStockInline(admin.TabularInline):
+    model = BranchStock
+    extra = 0
+
+
+@admin.register(Book)
+class BookAdmin(LargeTableAdmin):
+    list_display = ['title', 'author_name', 'isbn', 'book_type', 'quantity', 'available_copies', 'is_retired']
+    search_fields = ['=isbn', '^title', '^author_name']
+    list_filter = ['is_retired']
+    ordering = ['-id']
+    # Network totals follow the branch stock rows below.
+    readonly_fields = ['quantity', 'available_copies']
+    inlines = [BranchStockInline]
+
+    def get_queryset(self, request):
+        # Admins see retired books too.
+        return Book.all_objects.order_by('-id')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_book_totals([form.instance.pk])
+
+
+@admin.register(BranchStock)
+class BranchStockAdmin(LargeTableAdmin):
+    list_display = ['book', 'branch', 'quantity', 'available_copies']
+    list_select_related = ['book', 'branch']
+    list_filter = ['branch']
+    raw_id_fields = ['book']
+    search_fields = ['=book__isbn', '^book__title']
+    ordering = ['branch', 'book']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_book_totals([obj.book_id])
+
+
+@admin.register(Student)
+class StudentAdmin(LargeTableAdmin):
+    list_display = ['name', 'registration_no', 'branch', 'department', 'semester', 'shift', 'user']
+    list_select_related = ['user', 'branch']
+    # Usernames are matched exactly so the unique index on auth_user serves it.
+    search_fields = ['=registration_no', '^name', 'user__username__exact']
+    list_filter = ['branch', 'department']
+    raw_id_fields = ['user']
+    ordering = ['-id']
+
+
+@admin.register(Issue)
+class IssueAdmin(LargeTableAdmin):
+    list_display = ['id', 'branch', 'book', 'student', 'issue_date', 'due_date', 'is_returned', 'return_date']
+    list_select_related = ['branch', 'book', 'student']
+    autocomplete_fields = ['book', 'student']
+    search_fields = ['=book__isbn', '=student__registration_no']
+    list_filter = ['branch', 'is_returned']
+    date_hierarchy = 'issue_date'
+    ordering = ['-id']
+
+
+@admin.register(BorrowRequest)
+class BorrowRequestAdmin(LargeTableAdmin):
+    list_display = ['id', 'branch', 'book', 'student', 'request_date', 'status', 'out_of_stock']
+    list_select_related = ['branch', 'book', 'student']
+    autocomplete_fields = ['book', 'student']
+    search_fields = ['=book__isbn', '=student__registration_no']
+    list_filter = ['branch', 'status']
+    date_hierarchy = 'request_date'
+    ordering = ['-id']
+
+
+@admin.register(IssueArchive)
+class IssueArchiveAdmin(LargeTableAdmin):
+    list_display = ['id', 'branch', 'book', 'student', 'issue_date', 'due_date', 'return_date']
+    list_select_related = ['branch', 'book', 'student']
+    raw_id_fields = ['book', 'student']
+    list_filter = ['branch']
+    search_fields = ['=book__isbn', '=student__registration_no']
+    date_hierarchy = 'return_date'
+    ordering = ['-return_date']
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'status', 'progress', 'attempts', 'owner', 'created_at', 'finished_at']
+    list_select_related = ['owner']
+    list_filter = ['status', 'name']
+    raw_id_fields = ['owner']
+    ordering = ['-id']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('payload', 'output')
+
+
+@admin.register(ReminderLog)
+class ReminderLogAdmin(LargeTableAdmin):
+    list_display = ['id', 'issue_id', 'kind', 'due_date', 'sent_at']
+    list_filter = ['kind']
+    raw_id_fields = ['issue']
+    ordering = ['-id']
+
+
+@admin.register(CirculationEvent)
+class CirculationEventAdmin(LargeTableAdmin):
+    list_display = ['id', 'kind', 'book_id', 'student_id', 'issue_id', 'delta', 'note', 'created_at']
+    list_filter = ['kind']
+    raw_id_fields = ['book', 'student']
+    ordering = ['-id']
+
+
+@admin.register(BookRecommendation)
+class BookRecommendationAdmin(LargeTableAdmin):
+    list_display = ['book', 'rank', 'recommended', 'score']
+    list_select_related = ['book', 'recommended']
+    raw_id_fields = ['book', 'recommended']
+    search_fields = ['=book__isbn']
+    ordering = ['book', 'rank']
@@ -0,0 +1,268 @@
+import csv
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Func, IntegerField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Book, BorrowRequest, BranchStock, Issue, IssueArchive, Student
+
+
+FETCH_SIZE = 100_000
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+CSV_COLUMNS = [
+    'id', 'title', 'isbn', 'book_type', 'quantity', 'available_copies', 'loans', 'utilization',
+    'peak_concurrent', 'pending', 'lost', 'queue_pressure', 'seasonal_factor', 'recommended', 'change',
+]
+
+
+class EpochDay(Func):
+    """
+    A date as whole days since 1970-01-01, computed by the database so
+    millions of dates arrive as plain integers instead of being converted
+    one Python ``date`` at a time.
+    """
+
+    output_field = IntegerField()
+    template = "(%(expressions)s - DATE '1970-01-01')"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)", **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="(TO_DAYS(%(expressions)s) - 719528)", **extra_context)
+
+
+def _fetch_columns(queryset, converters):
+    """
+    Run ``queryset`` on a raw cursor and return one NumPy array per column,
+    built batch by batch with ``converters`` (one callable per column that
+    turns a tuple of values into an array).
+    """
+    import numpy as np
+
+    sql, params = queryset.query.sql_with_params()
+    parts = [[] for _ in converters]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for part, convert, column in zip(parts, converters, zip(*rows)):
+                part.append(convert(column))
+    return [np.concatenate(part) if part else convert(()) for part, convert in zip(parts, converters)]
+
+
+def _ints(column):
+    import numpy as np
+    return np.fromiter(column, dtype=np.int64, count=len(column))
+
+
+def _labels(column):
+    import numpy as np
+    return np.array(column, dtype=object)
+
+
+class DemandReport:
+    """
+    Per-book demand figures for the ``window_days`` ending with ``today``, for
+    one ``branch`` (its stock, loans and requests) or the whole network.
+
+    Everything is computed with NumPy over column arrays loaded in one
+    pass per table: loans (live and archived), borrow requests, books and
+    student departments.
+    """
+
+    def __init__(self, window_days=365, today=None, target_utilization=None, branch=None):
+        self.today = today or date.today()
+        self.branch = branch
+        self.window_days = window_days
+        # The window is exactly window_days long, today included.
+        self.window_start = self.today - timedelta(days=window_days - 1)
+        self.target_utilization = target_utilization or settings.DEMAND_TARGET_UTILIZATION
+        self._load()
+        self._compute()
+
+    def _load(self):
+        import numpy as np
+
+        tomorrow = self.today + timedelta(days=1)
+        if self.branch is None:
+            books = Book.objects.order_by('id').values_list('id', 'quantity', 'available_copies', 'book_type')
+        else:
+            books = (
+                BranchStock.objects.for_branch(self.branch).filter(book__is_retired=False).order_by('book_id')
+                .values_list('book_id', 'quantity', 'available_copies', 'book__book_type')
+            )
+        self.book_id, self.quantity, self.available, book_type = _fetch_columns(
+            books, [_ints, _ints, _ints, _labels],
+        )
+        self.book_types, self.book_type_code = np.unique(book_type.astype(str), return_inverse=True)
+
+        student_id, department = _fetch_columns(
+            Student.objects.order_by('id').values_list('id', 'department'), [_ints, _labels],
+        )
+        self.departments, department_code = np.unique(department.astype(str), return_inverse=True)
+
+        # Loans still open count as running until the end of today.
+        loans = Issue.objects.for_branch(self.branch).filter(issue_date__lt=tomorrow).exclude(return_date__lt=self.window_start)
+        archived = IssueArchive.objects.for_branch(self.branch).filter(issue_date__lt=tomorrow, return_date__gte=self.window_start)
+        columns = ('book_id', 'student_id', EpochDay('issue_date'), EpochDay(Coalesce('return_date', Value(tomorrow))))
+        loan_book, loan_student, start, end = _fetch_columns(
+            loans.values_list(*columns).union(archived.values_list(*columns), all=True),
+            [_ints, _ints, _ints, _ints],
+        )
+        known = np.isin(loan_book, self.book_id)
+        self.loan_book = np.searchsorted(self.book_id, loan_book[known])
+        self.loan_start = start[known]
+        self.loan_end = end[known]
+        student_pos = np.clip(np.searchsorted(student_id, loan_student[known]), 0, max(len(student_id) - 1, 0))
+        self.loan_department = department_code[student_pos] if len(student_id) else np.zeros(0, dtype=np.int64)
+
+        request_book, pending, lost = _fetch_columns(
+            BorrowRequest.objects.for_branch(self.branch).filter(status__in=['Pending', 'Rejected'])
+            .values_list('book_id', 'status', 'out_of_stock')
+            .filter(request_date__gte=self.window_start),
+            [_ints, _labels, _ints],
+        )
+        known = np.isin(request_book, self.book_id)
+        request_pos = np.searchsorted(self.book_id, request_book[known])
+        n = len(self.book_id)
+        self.pending = np.bincount(request_pos[pending[known] == 'Pending'], minlength=n)
+        self.lost = np.bincount(request_pos[lost[known].astype(bool)], minlength=n)
+
+    def _compute(self):
+        import numpy as np
+
+        n = len(self.book_id)
+        first_day = np.datetime64(self.window_start, 'D').astype(np.int64)
+        last_day = np.datetime64(self.today, 'D').astype(np.int64) + 1
+        start = np.clip(self.loan_start, first_day, last_day)
+        end = np.clip(self.loan_end, first_day, last_day)
+        in_window = end > start
+        book, start, end = self.loan_book[in_window], start[in_window], end[in_window]
+
+        self.loans = np.bincount(book, minlength=n)
+        loan_days = np.bincount(book, weights=end - start, minlength=n)
+        self.avg_concurrent = loan_days / self.window_days
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.utilization = np.where(self.quantity > 0, self.avg_concurrent / self.quantity, 0.0)
+            self.queue_pressure = np.where(
+                self.quantity > 0, (self.pending + self.lost) / self.quantity, self.pending + self.lost,
+            )
+
+        # Peak simultaneous loans: +1 on issue, -1 on return, swept in date
+        # order per book. Every book's events sum to zero, so one global
+        # cumulative sum never leaks from one book into the next.
+        event_book = np.concatenate([book, book])
+        event_day = np.concatenate([start, end])
+        event_delta = np.concatenate([np.ones(len(book), np.int64), -np.ones(len(book), np.int64)])
+        order = np.lexsort((event_delta, event_day, event_book))
+        running = np.cumsum(event_delta[order])
+        self.peak_concurrent = np.zeros(n, dtype=np.int64)
+        if len(running):
+            sorted_book = event_book[order]
+            run_starts = np.flatnonzero(np.r_[True, sorted_book[1:] != sorted_book[:-1]])
+            self.peak_concurrent[sorted_book[run_starts]] = np.maximum.reduceat(running, run_starts)
+
+        # Loans per calendar month for every book type x department.
+        month = (self.loan_start[in_window].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)) % 12
+        type_code = self.book_type_code[book]
+        department = self.loan_department[in_window]
+        n_types, n_departments = len(self.book_types), max(len(self.departments), 1)
+        self.seasonal = np.bincount(
+            (type_code * n_departments + department) * 12 + month,
+            minlength=n_types * n_departments * 12,
+        ).reshape(n_types, n_departments, 12)
+
+        # Copies out on each day of the window per book type: +1 on the day
+        # a loan starts, -1 on the day it ends, summed up over the days.
+        days = int(last_day - first_day)
+        change = (
+            np.bincount(type_code * (days + 1) + (start - first_day), minlength=n_types * (days + 1))
+            - np.bincount(type_code * (days + 1) + (end - first_day), minlength=n_types * (days + 1))
+        )
+        daily = change.reshape(n_types, days + 1).cumsum(axis=1)[:, :days]
+
+        # Busiest calendar month relative to the whole window, per book type.
+        # Only the months the window covers count, each by its covered days,
+        # so a steady load gives 1.0 whatever the window length.
+        day_month = np.arange(first_day, last_day).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+        covered = np.bincount(day_month, minlength=12)
+        monthly = np.array([np.bincount(day_month, weights=row, minlength=12) for row in daily]).reshape(n_types, 12)
+        monthly_mean = monthly[:, covered > 0] / covered[covered > 0]
+        overall = daily.mean(axis=1) if days else np.zeros(n_types)
+        type_factor = np.ones(n_types)
+        busy = overall > 0
+        type_factor[busy] = monthly_mean[busy].max(axis=1) / overall[busy]
+        self.seasonal_factor = type_factor[self.book_type_code] if n else np.zeros(0)
+
+        # Requests turned away for lack of stock, converted to copies using
+        # the book's average loan length.
+        avg_loan_days = np.where(self.loans > 0, loan_days / np.maximum(self.loans, 1), 7.0)
+        lost_concurrent = self.lost * avg_loan_days / self.window_days
+        demand = self.avg_concurrent * self.seasonal_factor + lost_concurrent
+        self.recommended = np.maximum(
+            np.maximum(np.ceil(demand / self.target_utilization), self.peak_concurrent), 1,
+        ).astype(np.int64)
+
+    def rows(self, order_by_gap=True, limit=None):
+        """Yield one dict per book, largest shortage first by default."""
+        import numpy as np
+
+        order = np.argsort(self.quantity - self.recommended, kind='stable') if order_by_gap else np.arange(len(self.book_id))
+        if limit is not None:
+            order = order[:limit]
+            books = Book.objects.filter(id__in=self.book_id[order].tolist())
+        else:
+            books = Book.objects.all() if self.branch is None else Book.objects.filter(stock__branch=self.branch)
+        details = {pk: (title, isbn) for pk, title, isbn in books.values_list('id', 'title', 'isbn').iterator(chunk_size=5000)}
+        for i in order.tolist():
+            title, isbn = details.get(int(self.book_id[i]), ('', ''))
+            yield {
+                'id': int(self.book_id[i]),
+                'title': title,
+                'isbn': isbn,
+                'book_type': str(self.book_types[self.book_type_code[i]]),
+                'quantity': int(self.quantity[i]),
+                'available_copies': int(self.available[i]),
+                'loans': int(self.loans[i]),
+                'utilization': round(float(self.utilization[i]) * 100, 1),
+                'peak_concurrent': int(self.peak_concurrent[i]),
+                'pending': int(self.pending[i]),
+                'lost': int(self.lost[i]),
+                'queue_pressure': round(float(self.queue_pressure[i]), 2),
+                'seasonal_factor': round(float(self.seasonal_factor[i]), 2),
+                'recommended': int(self.recommended[i]),
+                'change': int(self.recommended[i] - self.quantity[i]),
+            }
+
+    def write_csv(self, out):
+        """Write every book's row to ``out`` as CSV; returns the number of rows."""
+        writer = csv.writer(out)
+        writer.writerow(CSV_COLUMNS)
+        count = 0
+        for row in self.rows():
+            writer.writerow([row[column] for column in CSV_COLUMNS])
+            count += 1
+        return count
+
+    def seasonal_rows(self):
+        """Monthly loan counts per (book type, department) pair that had any loans."""
+        for t, book_type in enumerate(self.book_types):
+            for d, department in enumerate(self.departments):
+                counts = self.seasonal[t, d]
+                if counts.any():
+                    peak = int(counts.argmax())
+                    yield {
+                        'book_type': str(book_type),
+                        'department': str(department),
+                        'months': counts.tolist(),
+                        'total': int(counts.sum()),
+                        'peak_month': MONTHS[peak],
+                    }
+
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class LibraryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'library'
\ No newline at end of file
+    name = 'library'
+
+    def ready(self):
+        from . import checks, tasks  # noqa: F401  registers system checks and background job handlers
@@ -0,0 +1,79 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Issue, IssueArchive
+
+
+ARCHIVE_FIELDS = ['id', 'branch_id', 'book_id', 'student_id', 'issue_date', 'due_date', 'return_date']
+HISTORY_FIELDS = ['issue_date', 'due_date', 'return_date']
+
+
+def ensure_partitions(years):
+    """Create the yearly IssueArchive partitions on PostgreSQL if missing."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for year in sorted(set(years)):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS library_issuearchive_y{year:04d} "
+                f"PARTITION OF library_issuearchive "
+                f"FOR VALUES FROM ('{year:04d}-01-01') TO ('{year + 1:04d}-01-01')"
+            )
+
+
+def archive_returned_issues(older_than_days=None, chunk_size=1000, pause=0, limit=None, progress=None, **filters):
+    """
+    Move returned loans older than ``older_than_days`` (and matching any
+    extra Issue ``filters``) from Issue into IssueArchive. Each chunk is
+    copied and deleted in its own short transaction so the live table
+    stays available while this runs. ``progress(archived)`` is called
+    after every chunk. Returns the number of archived rows.
+    """
+    if older_than_days is None:
+        older_than_days = settings.ISSUE_ARCHIVE_AFTER_DAYS
+    cutoff = date.today() - timedelta(days=older_than_days)
+
+    candidates = Issue.objects.filter(is_returned=True, return_date__lt=cutoff, **filters).order_by('pk')
+    if connection.features.has_select_for_update_skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+
+    archived = 0
+    while limit is None or archived < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - archived)
+        with transaction.atomic():
+            rows = list(candidates.values(*ARCHIVE_FIELDS)[:size])
+            if not rows:
+                break
+            ensure_partitions(row['return_date'].year for row in rows)
+            IssueArchive.objects.bulk_create(
+                [IssueArchive(**row) for row in rows],
+                ignore_conflicts=True,
+            )
+            Issue.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        if progress:
+            progress(archived)
+        if pause:
+            time.sleep(pause)
+    return archived
+
+
+def returned_history(**filters):
+    """
+    Returned loans from both the live Issue table and IssueArchive as one
+    queryset of dicts with ``book_title``, ``book_isbn``, ``student_name``,
+    ``registration_no``, ``issue_date``, ``due_date`` and ``return_date``.
+    """
+    columns = dict(
+        book_title=F('book__title'),
+        book_isbn=F('book__isbn'),
+        student_name=F('student__name'),
+        registration_no=F('student__registration_no'),
+    )
+    live = Issue.objects.filter(is_returned=True, **filters).values(*HISTORY_FIELDS, **columns)
+    archived = IssueArchive.objects.filter(**filters).values(*HISTORY_FIELDS, **columns)
+    return live.union(archived, all=True)
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Book, Branch, BranchStock, Student, default_branch
+
+
+SESSION_KEY = 'branch'
+ALL_BRANCHES = 'all'
+
+
+def current_branch(request):
+    """
+    The branch pages are scoped to by default: a student's home branch, or
+    for staff the branch chosen with the switcher (``None`` once they pick
+    "All branches"). Looked up once per request.
+    """
+    if not hasattr(request, '_branch'):
+        request._branch = _find_branch(request)
+    return request._branch
+
+
+def _find_branch(request):
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    if user.is_staff:
+        choice = request.session.get(SESSION_KEY)
+        if choice == ALL_BRANCHES:
+            return None
+        branch = Branch.objects.filter(pk=choice).first() if choice else None
+        return branch or Branch.objects.get(pk=default_branch())
+    student = Student.objects.filter(user=user).select_related('branch').first()
+    return student.branch if student else None
+
+
+def working_branch(request):
+    """Where staff stock changes and counter loans happen: the current branch, or the main one when viewing all."""
+    return current_branch(request) or Branch.objects.get(pk=default_branch())
+
+
+def branch_filter(branch):
+    """Keyword filters for querysets without ``for_branch`` (e.g. returned_history)."""
+    return {} if branch is None else {'branch': branch}
+
+
+def get_stock(book, branch):
+    return BranchStock.objects.filter(branch=branch, book=book).first()
+
+
+@transaction.atomic
+def move_stock(book, branch, delta):
+    """Put ``delta`` copies back on (or take them off) the shelf at ``branch``, and the network total with them."""
+    BranchStock.objects.filter(branch=branch, book=book).update(available_copies=F('available_copies') + delta)
+    Book.all_objects.filter(pk=book.pk).update(available_copies=F('available_copies') + delta)
+    book.available_copies += delta
+
+
+@transaction.atomic
+def set_branch_quantity(book, branch, quantity):
+    """
+    Set how many copies ``branch`` owns. Copies on its shelf change by the
+    same amount (never below zero). Returns the change in available copies.
+    """
+    stock, _ = BranchStock.objects.select_for_update().get_or_create(branch=branch, book=book)
+    old_available = stock.available_copies
+    stock.available_copies = max(stock.available_copies + quantity - stock.quantity, 0)
+    stock.quantity = quantity
+    stock.save()
+    refresh_book_totals([book.pk])
+    book.refresh_from_db(fields=['quantity', 'available_copies'])
+    return stock.available_copies - old_available
+
+
+def refresh_book_totals(book_ids=None):
+    """Recompute the network totals on Book from its BranchStock rows, for ``book_ids`` or every book."""
+    stock = BranchStock.objects.filter(book=OuterRef('pk')).order_by().values('book')
+
+    def total(field):
+        return Coalesce(Subquery(stock.annotate(total=Sum(field)).values('total')), Value(0))
+
+    books = Book.all_objects.all() if book_ids is None else Book.all_objects.filter(pk__in=book_ids)
+    return books.update(quantity=total('quantity'), available_copies=total('available_copies'))
+
+
+def branch_context(request):
+    """Template context for the branch switcher shown to staff."""
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return {}
+    return {'current_branch': current_branch(request), 'branches': Branch.objects.all()}
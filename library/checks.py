@@ -0,0 +1,33 @@
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+def events_cache_warnings(workers):
+    """
+    Dashboard events reach other worker processes only through a shared
+    cache. With several workers and a per-process one (the default
+    ``locmemcache://``), each dashboard sees only the changes made by the
+    worker its stream landed on.
+    """
+    cache = caches[settings.EVENTS_CACHE_ALIAS]
+    if workers <= 1 or not isinstance(cache, (LocMemCache, DummyCache)):
+        return []
+    return [
+        Warning(
+            f"Dashboard events use the per-process cache '{settings.EVENTS_CACHE_ALIAS}' "
+            f"but {workers} worker processes are configured.",
+            hint="Set CACHE_URL (or EVENTS_CACHE_ALIAS) to a shared cache such as Redis, or run a single worker.",
+            id='library.W001',
+        )
+    ]
+
+
+@register(Tags.caches, deploy=True)
+def check_events_cache(app_configs, **kwargs):
+    # The same default as gunicorn.conf.py.
+    return events_cache_warnings(int(os.environ.get('WEB_CONCURRENCY', 2)))
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE_KEY = 'events:seq'
+
+
+def event_key(seq):
+    return f'events:{seq}'
+
+
+def get_cache():
+    return caches[settings.EVENTS_CACHE_ALIAS]
+
+
+def publish(kind, **data):
+    """
+    Send an event to every open dashboard once the current transaction
+    commits. Events go through the cache, so with a shared cache every
+    ASGI worker sees them; with the default local-memory cache only the
+    worker that published them does.
+    """
+    transaction.on_commit(lambda: _store(kind, data))
+
+
+def _store(kind, data):
+    cache = get_cache()
+    try:
+        cache.add(SEQUENCE_KEY, 0, timeout=None)
+        seq = cache.incr(SEQUENCE_KEY)
+        cache.set(event_key(seq), {'kind': kind, 'data': data}, timeout=settings.EVENTS_KEEP_SECONDS)
+    except Exception:
+        # A missed live update only means a stale counter until the next reload.
+        logger.exception("Could not publish %s event", kind)
+
+
+def fetch_events(after, until):
+    """Events ``after`` < seq <= ``until`` as ``(seq, event)``, stopping at the first one not stored yet."""
+    if until <= after:
+        return []
+    cache = get_cache()
+    found = cache.get_many([event_key(seq) for seq in range(after + 1, until + 1)])
+    events = []
+    for seq in range(after + 1, until + 1):
+        if event_key(seq) not in found:
+            break
+        events.append((seq, found[event_key(seq)]))
+    return events
+
+
+class Relay:
+    """
+    One poller per worker process: while anyone is listening it reads new
+    events from the cache every EVENTS_POLL_INTERVAL seconds and hands them
+    to each listener's queue. Idle streams cost a queue each; the cache
+    reads do not grow with the number of listeners.
+    """
+
+    def __init__(self):
+        self.listeners = set()
+        self.task = None
+        self.last_seq = 0
+
+    async def current_seq(self):
+        return await get_cache().aget(SEQUENCE_KEY, 0)
+
+    async def subscribe(self):
+        if not self.listeners:
+            self.last_seq = await self.current_seq()
+        queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.listeners.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.listeners.discard(queue)
+
+    async def run(self):
+        stalled = 0
+        while self.listeners:
+            await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+            try:
+                latest = await self.current_seq()
+                events = await sync_to_async(fetch_events)(self.last_seq, latest)
+            except Exception:
+                logger.exception("Could not read dashboard events")
+                continue
+            if events:
+                stalled = 0
+                self.last_seq = events[-1][0]
+                self.dispatch(events)
+            elif latest > self.last_seq:
+                # The next event was counted but never stored (or expired);
+                # give a slow publisher a few polls, then skip past it.
+                stalled += 1
+                if stalled > 3:
+                    self.last_seq, stalled = latest, 0
+            else:
+                stalled = 0
+
+    def dispatch(self, events):
+        for queue in list(self.listeners):
+            for event in events:
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # This client is not reading; end its stream so the
+                    # browser reconnects and catches up from a snapshot.
+                    self.unsubscribe(queue)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+                    break
+
+
+_relays = weakref.WeakKeyDictionary()
+
+
+def get_relay():
+    """The relay for the running event loop (one per ASGI worker)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _relays:
+        _relays[loop] = Relay()
+    return _relays[loop]
+
+
+def format_event(kind, data, seq=None):
+    lines = [f'id: {seq}'] if seq is not None else []
+    lines += [f'event: {kind}', f'data: {json.dumps(data, default=str)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(last_event_id=None, snapshot=None):
+    """
+    Server-sent events for one dashboard. A reconnecting browser sends the
+    last id it saw; missed events are replayed from the cache when they are
+    all still there, otherwise ``snapshot()`` supplies fresh totals.
+    """
+    relay = get_relay()
+    queue = await relay.subscribe()
+    # Everything after this point arrives through the queue.
+    seen = relay.last_seq
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        if last_event_id is not None and last_event_id != seen:
+            missed = await sync_to_async(fetch_events)(last_event_id, seen)
+            if last_event_id < seen and len(missed) == seen - last_event_id:
+                for seq, event in missed:
+                    yield format_event(event['kind'], event['data'], seq)
+            elif snapshot is not None:
+                yield format_event('snapshot', await sync_to_async(snapshot)(), seen)
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), settings.EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Keeps proxies (Heroku closes idle connections after 55s) from dropping us.
+                yield ': keep-alive\n\n'
+                continue
+            if item is None:
+                return
+            seq, event = item
+            yield format_event(event['kind'], event['data'], seq)
+    finally:
+        relay.unsubscribe(queue)
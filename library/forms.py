@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from .models import Book, Student, Issue
 from django.contrib.auth.models import User
 from datetime import date
@@ -30,7 +31,7 @@ class UserRegistrationForm(forms.ModelForm):
 class StudentProfileForm(forms.ModelForm):
     class Meta:
         model = Student
-        fields = ['name', 'registration_no', 'roll', 'department', 'season', 'semester', 'shift']
+        fields = ['name', 'registration_no', 'roll', 'department', 'season', 'semester', 'shift', 'branch']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'registration_no': forms.TextInput(attrs={'class': 'form-control'}),
@@ -39,8 +40,14 @@ class StudentProfileForm(forms.ModelForm):
             'season': forms.TextInput(attrs={'class': 'form-control'}),
             'semester': forms.TextInput(attrs={'class': 'form-control'}),
             'shift': forms.TextInput(attrs={'class': 'form-control'}),
+            'branch': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Every student belongs to a branch; the main one is preselected.
+        self.fields['branch'].empty_label = None
+
 
 class BookForm(forms.ModelForm):
     class Meta:
@@ -54,6 +61,32 @@ class BookForm(forms.ModelForm):
             'quantity': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+    def clean_isbn(self):
+        isbn = self.cleaned_data['isbn']
+        retired = Book.all_objects.filter(isbn=isbn, is_retired=True).exclude(pk=self.instance.pk)
+        if retired.exists():
+            raise forms.ValidationError("This ISBN belongs to a retired book that has not been purged yet.")
+        return isbn
+
+
+class StudentImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label='Student CSV File',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label='Validate only (do not create accounts)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_csv_file(self):
+        csv_file = self.cleaned_data['csv_file']
+        limit = settings.JOB_PAYLOAD_MAX_BYTES
+        if csv_file.size > limit:
+            raise forms.ValidationError(f"The file is too large (limit {limit // (1024 * 1024)} MB).")
+        return csv_file
+
 
 class IssueBookForm(forms.Form):
     registration_no = forms.CharField(
@@ -72,15 +105,20 @@ class IssueBookForm(forms.Form):
 
 
 class ReturnBookForm(forms.Form):
+    # The real queryset is built per form in __init__.
     issue_record = forms.ModelChoiceField(
-        queryset=Issue.objects.filter(is_returned=False).select_related('student', 'book').order_by('issue_date'),
+        queryset=Issue.objects.none(),
         label='Select Book/Student to Return',
         widget=forms.Select(attrs={'class': 'form-control'}),
         empty_label="--- Select an Issued Book to Confirm Return ---"
     )
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, branch=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['issue_record'].queryset = (
+            Issue.objects.for_branch(branch).filter(is_returned=False)
+            .select_related('student', 'book').order_by('issue_date')
+        )
         self.fields['issue_record'].label_from_instance = self.get_issue_label
 
     def get_issue_label(self, issue):
@@ -90,8 +128,9 @@ class ReturnBookForm(forms.Form):
 
 class RenewBookForm(forms.Form):
     
+    # Built per form in __init__ so "not overdue" means today, not the day the worker started.
     issue_record = forms.ModelChoiceField(
-        queryset=Issue.objects.filter(is_returned=False, due_date__gte=date.today()).select_related('book', 'student'),
+        queryset=Issue.objects.none(),
         label="Select Issued Book to Renew",
         widget=forms.Select(attrs={'class': 'form-control'}),
         empty_label="--- Select a Non-Overdue Issued Book ---"
@@ -106,8 +145,12 @@ class RenewBookForm(forms.Form):
         help_text="Enter the number of days to extend the due date."
     )
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, branch=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['issue_record'].queryset = (
+            Issue.objects.for_branch(branch).filter(is_returned=False, due_date__gte=date.today())
+            .select_related('book', 'student')
+        )
         self.fields['issue_record'].label_from_instance = self.get_issue_label
 
     def get_issue_label(self, issue):
@@ -0,0 +1,181 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name):
+    """Register ``func(job, **args)`` as the handler for jobs called ``name``."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, owner=None, run_at=None, max_attempts=None, payload=None, **args):
+    """Queue job ``name``; ``payload`` is an optional input file (bytes) stored with the job."""
+    if name not in TASKS:
+        raise ValueError(f"Unknown job '{name}'.")
+    return Job.objects.create(
+        name=name,
+        args=args,
+        owner=owner,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        payload=payload,
+    )
+
+
+def report_progress(job, done, total=None, message=''):
+    """Record progress from inside a running job; ``done`` is a percentage unless ``total`` is given."""
+    percent = int(done * 100 / total) if total else int(done)
+    job.progress = max(0, min(percent, 100))
+    job.progress_message = message[:200]
+    Job.objects.filter(pk=job.pk).update(
+        progress=job.progress, progress_message=job.progress_message, heartbeat_at=timezone.now(),
+    )
+
+
+def claim_job(worker_id):
+    """
+    Take the oldest runnable job, or return None if there is none.
+    PostgreSQL uses SELECT ... FOR UPDATE SKIP LOCKED so workers never wait
+    on each other. SQLite serializes writers, so there a conditional UPDATE
+    decides which worker gets the job and the loser tries the next one.
+    """
+    now = timezone.now()
+    runnable = Job.objects.filter(status='Queued', run_at__lte=now).order_by('run_at', 'pk')
+    claim = dict(status='Running', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1, locked_by=worker_id)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = runnable.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claim)
+    else:
+        while True:
+            job = runnable.first()
+            if job is None:
+                return None
+            if Job.objects.filter(pk=job.pk, status='Queued').update(**claim):
+                break
+    job.refresh_from_db()
+    return job
+
+
+class Heartbeat(threading.Thread):
+    """
+    Touches ``heartbeat_at`` every JOB_HEARTBEAT_INTERVAL seconds while a
+    job runs, so a long job is never mistaken for one whose worker died.
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f'heartbeat-{job.pk}', daemon=True)
+        self.job_id = job.pk
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    Job.objects.filter(pk=self.job_id, status='Running').update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.warning("Could not record a heartbeat for job %s", self.job_id, exc_info=True)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def requeue_stale_jobs():
+    """Put back running jobs whose worker has stopped sending heartbeats."""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_STALE_AFTER)
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status='Running',
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='Failed', error="Worker stopped while running this job.", finished_at=now, locked_by='',
+    )
+    return stale.update(status='Queued', locked_by='')
+
+
+def run_job(job):
+    handler = TASKS.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job '{job.name}'.")
+        heartbeat = Heartbeat(job)
+        heartbeat.start()
+        try:
+            result = handler(job, **job.args)
+        finally:
+            heartbeat.stop()
+    except Exception:
+        logger.exception("Job %s failed (attempt %s/%s)", job, job.attempts, job.max_attempts)
+        job.error = traceback.format_exc()
+        job.finished_at = timezone.now()
+        if handler is not None and job.attempts < job.max_attempts:
+            job.status = 'Queued'
+            job.run_at = job.finished_at + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'Failed'
+    else:
+        job.status = 'Succeeded'
+        job.result = result
+        job.error = ''
+        job.progress = 100
+        job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'finished_at', 'run_at', 'locked_by'])
+    return job
+
+
+def run_worker(worker_id=None, poll_interval=1.0, burst=False, max_jobs=None):
+    """
+    Claim and run jobs until stopped. With ``burst`` the worker exits as
+    soon as the queue is empty. Returns the number of jobs processed.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    last_stale_check = None
+    while max_jobs is None or processed < max_jobs:
+        close_old_connections()
+        if last_stale_check is None or time.monotonic() - last_stale_check > settings.JOB_STALE_AFTER / 10:
+            requeue_stale_jobs()
+            last_stale_check = time.monotonic()
+
+        try:
+            job = claim_job(worker_id)
+        except OperationalError:
+            # SQLite reports "database is locked" while another writer is busy.
+            logger.warning("Could not claim a job, retrying", exc_info=True)
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,111 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .branches import refresh_book_totals
+from .models import Book, BranchStock, CirculationEvent, Issue
+
+
+class LedgerWriter:
+    """
+    Buffer circulation events and insert them with bulk_create, either
+    every ``batch_size`` events or when the ``with`` block ends.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.events = []
+
+    def add(self, kind, book, delta=0, student=None, issue=None, note=''):
+        self.events.append(CirculationEvent(
+            kind=kind,
+            book_id=getattr(book, 'pk', book),
+            student_id=getattr(student, 'pk', student),
+            issue_id=getattr(issue, 'pk', issue),
+            delta=delta,
+            note=note[:200],
+        ))
+        if len(self.events) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.events:
+            CirculationEvent.objects.bulk_create(self.events, batch_size=self.batch_size)
+            self.events = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+def record_event(kind, book, delta=0, student=None, issue=None, note=''):
+    with LedgerWriter() as ledger:
+        ledger.add(kind, book, delta=delta, student=student, issue=issue, note=note)
+
+
+def find_drift():
+    """
+    Branch stock rows whose available_copies differs from quantity minus
+    the branch's open loans of that book, found with one GROUP BY over open
+    Issue rows joined to BranchStock. Returns a list of
+    ``(stock_id, branch_id, book_id, title, quantity, available_copies, open_loans)``.
+    """
+    stock = BranchStock._meta.db_table
+    book = Book._meta.db_table
+    issue = Issue._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT s.id, s.branch_id, s.book_id, b.title, s.quantity, s.available_copies, COALESCE(o.open_loans, 0)
+            FROM {stock} s
+            JOIN {book} b ON b.id = s.book_id
+            LEFT JOIN (
+                SELECT branch_id, book_id, COUNT(*) AS open_loans
+                FROM {issue}
+                WHERE is_returned = %s
+                GROUP BY branch_id, book_id
+            ) o ON o.branch_id = s.branch_id AND o.book_id = s.book_id
+            WHERE s.available_copies <> (
+                CASE WHEN s.quantity - COALESCE(o.open_loans, 0) > 0
+                     THEN s.quantity - COALESCE(o.open_loans, 0) ELSE 0 END
+            )
+            ORDER BY s.branch_id, s.book_id
+            """,
+            [False],
+        )
+        return cursor.fetchall()
+
+
+def expected_available():
+    open_loans = (
+        Issue.objects.filter(branch=OuterRef('branch'), book=OuterRef('book'), is_returned=False)
+        .order_by()
+        .values('branch', 'book')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Greatest(F('quantity') - Coalesce(Subquery(open_loans), Value(0)), Value(0))
+
+
+def repair_drift(drift, chunk_size=5000):
+    """
+    Set available_copies back to quantity minus open loans (never below
+    zero) for the drifted stock rows, with one UPDATE per ``chunk_size``
+    rows, refresh the affected books' network totals, and log a reconcile
+    event for each row. Returns the number of stock rows fixed.
+    """
+    ids = [row[0] for row in drift]
+    book_ids = sorted({row[2] for row in drift})
+    with transaction.atomic(), LedgerWriter() as ledger:
+        for start in range(0, len(ids), chunk_size):
+            BranchStock.objects.filter(pk__in=ids[start:start + chunk_size]).update(available_copies=expected_available())
+        for start in range(0, len(book_ids), chunk_size):
+            refresh_book_totals(book_ids[start:start + chunk_size])
+        for stock_id, branch_id, book_id, title, quantity, available, open_loans in drift:
+            expected = max(quantity - open_loans, 0)
+            ledger.add('reconcile', book_id, delta=expected - available,
+                       note=f"branch #{branch_id}: available {available} -> {expected} ({open_loans} open loans)")
+    return len(ids)
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library.archive import archive_returned_issues
+
+
+class Command(BaseCommand):
+    help = "Move returned loans older than N days from Issue into IssueArchive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ISSUE_ARCHIVE_AFTER_DAYS,
+                            help="Archive loans returned more than this many days ago.")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Rows moved per transaction.")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between chunks to limit load.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after archiving this many rows.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        archived = archive_returned_issues(
+            older_than_days=options['days'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            limit=options['limit'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} returned loans in {elapsed:.1f}s."))
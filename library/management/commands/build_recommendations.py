@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from library.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the \"also borrowed\" book recommendations from the loan history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10,
+                            help="Recommendations kept per book.")
+        parser.add_argument('--min-support', type=int, default=2,
+                            help="Minimum number of students who borrowed both books.")
+        parser.add_argument('--metric', choices=['cosine', 'count'], default='cosine',
+                            help="Rank by cosine similarity or by raw co-borrow count.")
+
+    def handle(self, *args, **options):
+        stats = build_recommendations(
+            top_k=options['top_k'],
+            min_support=options['min_support'],
+            metric=options['metric'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stats['recommendations']} recommendations from {stats['loans']} loans "
+            f"(load {stats['load_seconds']}s, compute {stats['compute_seconds']}s, store {stats['store_seconds']}s)."
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.onboarding import import_students, read_csv
+
+
+class Command(BaseCommand):
+    help = "Bulk-create student accounts (User + Student) from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help="CSV with username, email, password, name, registration_no, "
+                                             "roll, department, season, semester and shift columns.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Password hashing processes (default: CPU count).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows per INSERT.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate the file without creating anything.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                result = import_students(
+                    read_csv(f),
+                    workers=options['workers'],
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['csv_file']}: {e}")
+
+        for line, error in result.errors:
+            self.stderr.write(f"Line {line}: {error}")
+
+        if options['dry_run']:
+            self.stdout.write(f"{result.valid} valid rows, {len(result.errors)} errors (dry run, nothing created).")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} students in {result.elapsed:.1f}s "
+            f"({result.rows_per_sec:.0f} rows/sec), {len(result.errors)} rows skipped."
+        ))
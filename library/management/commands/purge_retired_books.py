@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.models import Book
+from library.retirement import purge_book
+
+
+class Command(BaseCommand):
+    help = "Delete the loan history of retired books, then the books themselves."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', type=int, action='append',
+                            help="Only purge this retired book id (may be repeated).")
+        parser.add_argument('--keep-history', action='store_true',
+                            help="Move returned loans to the archive and keep the retired book rows.")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Rows deleted per statement.")
+
+    def handle(self, *args, **options):
+        retired = Book.all_objects.filter(is_retired=True)
+        if options['book']:
+            retired = retired.filter(pk__in=options['book'])
+        book_ids = list(retired.values_list('pk', flat=True))
+        if options['book'] and len(book_ids) != len(set(options['book'])):
+            raise CommandError("Only retired books can be purged.")
+
+        for book_id in book_ids:
+            try:
+                counts = purge_book(book_id, chunk_size=options['chunk_size'], keep_history=options['keep_history'])
+            except ValueError as e:
+                self.stderr.write(str(e))
+                continue
+            summary = ', '.join(f"{count} {table.replace('_', ' ')}" for table, count in counts.items())
+            self.stdout.write(f"Book #{book_id}: {summary}")
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(book_ids)} retired books."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.branches import refresh_book_totals
+from library.ledger import find_drift, repair_drift
+
+
+class Command(BaseCommand):
+    help = "Check every branch's available copies against quantity minus open loans, and optionally fix drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help="Fix drifted books and record the corrections in the circulation ledger.")
+        parser.add_argument('--show', type=int, default=20,
+                            help="Number of drifted stock rows to list.")
+        parser.add_argument('--refresh-totals', action='store_true',
+                            help="Also recompute every book's network totals from its branch stock.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        drift = find_drift()
+        checked = time.monotonic() - started
+
+        for stock_id, branch_id, book_id, title, quantity, available, open_loans in drift[:options['show']]:
+            expected = max(quantity - open_loans, 0)
+            self.stdout.write(
+                f"#{book_id} {title} at branch #{branch_id}: available {available}, expected {expected} "
+                f"(quantity {quantity}, {open_loans} open loans)"
+            )
+        if len(drift) > options['show']:
+            self.stdout.write(f"... and {len(drift) - options['show']} more.")
+        self.stdout.write(f"{len(drift)} stock rows drifted (checked in {checked:.1f}s).")
+
+        if options['repair'] and drift:
+            repaired = repair_drift(drift)
+            self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} stock rows."))
+        if options['refresh_totals']:
+            refreshed = refresh_book_totals()
+            self.stdout.write(self.style.SUCCESS(f"Refreshed network totals for {refreshed} books."))
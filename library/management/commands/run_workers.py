@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from library.jobs import run_worker
+
+
+def _worker_main(poll_interval, burst):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(poll_interval=poll_interval, burst=burst)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (report generation, imports, archiving)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help="Number of worker processes.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+
+        if options['processes'] <= 1:
+            processed = run_worker(poll_interval=poll_interval, burst=burst)
+            self.stdout.write(self.style.SUCCESS(f"Worker finished after {processed} jobs."))
+            return
+
+        # Forked children must not share the parent's database connection.
+        connections.close_all()
+        # Not daemonic: jobs such as import_students start process pools of
+        # their own, which daemonic processes are not allowed to do. The
+        # parent stops its children itself instead.
+        workers = [
+            multiprocessing.Process(target=_worker_main, args=(poll_interval, burst))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} workers.")
+        # Heroku stops a dyno with SIGTERM; treat it like Ctrl-C.
+        previous = signal.signal(signal.SIGTERM, _interrupt)
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stop(workers)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
+
+    def stop(self, workers, timeout=10):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.kill()
+                worker.join()
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    help = "Email due-soon and overdue reminders for open loans. Safe to rerun."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['due_soon', 'overdue'], action='append',
+                            help="Only send this kind of reminder (may be repeated).")
+        parser.add_argument('--days', type=int, default=settings.REMINDER_DAYS_BEFORE,
+                            help="Remind about loans due within this many days.")
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help="Messages sent per SMTP batch.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Count the messages without sending them.")
+
+    def handle(self, *args, **options):
+        sent = send_reminders(
+            kinds=options['kind'] or ('due_soon', 'overdue'),
+            days_before=options['days'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = "Would send" if options['dry_run'] else "Sent"
+        for kind, count in sent.items():
+            self.stdout.write(self.style.SUCCESS(f"{verb} {count} {kind.replace('_', ' ')} reminders."))
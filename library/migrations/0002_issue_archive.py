@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POSTGRES_CREATE_SQL = """
+CREATE TABLE library_issuearchive (
+    id bigint NOT NULL,
+    issue_date date NOT NULL,
+    due_date date NOT NULL,
+    return_date date NOT NULL,
+    archived_at timestamp with time zone NOT NULL,
+    book_id bigint NOT NULL REFERENCES library_book (id) DEFERRABLE INITIALLY DEFERRED,
+    student_id bigint NOT NULL REFERENCES library_student (id) DEFERRABLE INITIALLY DEFERRED,
+    PRIMARY KEY (id, return_date)
+) PARTITION BY RANGE (return_date);
+CREATE TABLE library_issuearchive_default PARTITION OF library_issuearchive DEFAULT;
+CREATE INDEX issuearchive_return_idx ON library_issuearchive (return_date);
+CREATE INDEX library_issuearchive_book_id ON library_issuearchive (book_id);
+CREATE INDEX library_issuearchive_student_id ON library_issuearchive (student_id);
+"""
+
+
+def create_issue_archive_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CREATE_SQL)
+    else:
+        schema_editor.create_model(apps.get_model('library', 'IssueArchive'))
+
+
+def drop_issue_archive_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE library_issuearchive CASCADE")
+    else:
+        schema_editor.delete_model(apps.get_model('library', 'IssueArchive'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='IssueArchive',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('issue_date', models.DateField()),
+                        ('due_date', models.DateField()),
+                        ('return_date', models.DateField()),
+                        ('archived_at', models.DateTimeField(auto_now_add=True)),
+                        ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issues', to='library.book')),
+                        ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issues', to='library.student')),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['return_date'], name='issuearchive_return_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_issue_archive_table, drop_issue_archive_table),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['is_returned', 'return_date'], name='issue_returned_idx'),
+        ),
+    ]
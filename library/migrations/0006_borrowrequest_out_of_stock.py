@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_book_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowrequest',
+            name='out_of_stock',
+            field=models.BooleanField(default=False),
+        ),
+    ]
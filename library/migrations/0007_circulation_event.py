@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_borrowrequest_out_of_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('stock', 'Stock Change'), ('issue', 'Issue'), ('return', 'Return'), ('renew', 'Renewal'), ('reconcile', 'Reconciliation')], max_length=10)),
+                ('issue_id', models.BigIntegerField(blank=True, null=True)),
+                ('delta', models.IntegerField(default=0)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library.book')),
+                ('student', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', 'created_at'], name='circulation_book_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_circulation_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='is_retired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='retired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_retired', False)), fields=['title'], name='book_catalogue_idx'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:23
+
+import django.db.models.deletion
+import library.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_main_branch(apps, schema_editor):
+    # Everything that exists today belongs to the one library there was.
+    Branch = apps.get_model('library', 'Branch')
+    Branch.objects.get_or_create(code='main', defaults={'name': 'Main Library'})
+
+
+def stock_main_branch(apps, schema_editor):
+    Branch = apps.get_model('library', 'Branch')
+    BranchStock = apps.get_model('library', 'BranchStock')
+    Book = apps.get_model('library', 'Book')
+    main = Branch.objects.get(code='main')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {BranchStock._meta.db_table} (branch_id, book_id, quantity, available_copies) "
+            f"SELECT %s, id, quantity, available_copies FROM {Book._meta.db_table}",
+            [main.pk],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('code', models.SlugField(max_length=20, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(create_main_branch, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='BranchStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('available_copies', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='borrowrequest',
+            name='branch',
+            field=models.ForeignKey(db_index=False, default=library.models.default_branch, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='library.branch'),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='branch',
+            field=models.ForeignKey(db_index=False, default=library.models.default_branch, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='library.branch'),
+        ),
+        migrations.AddField(
+            model_name='issuearchive',
+            name='branch',
+            field=models.ForeignKey(db_index=False, default=library.models.default_branch, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='library.branch'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='branch',
+            field=models.ForeignKey(db_index=False, default=library.models.default_branch, on_delete=django.db.models.deletion.PROTECT, related_name='students', to='library.branch'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(fields=['branch', 'status', 'request_date'], name='borrowrequest_branch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['branch', 'is_returned', 'due_date'], name='issue_branch_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['branch', 'issue_date'], name='issue_branch_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuearchive',
+            index=models.Index(fields=['branch', 'return_date'], name='issuearchive_branch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['branch', 'name'], name='student_branch_idx'),
+        ),
+        migrations.AddField(
+            model_name='branchstock',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='library.book'),
+        ),
+        migrations.AddField(
+            model_name='branchstock',
+            name='branch',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='stock', to='library.branch'),
+        ),
+        migrations.AddConstraint(
+            model_name='branchstock',
+            constraint=models.UniqueConstraint(fields=('branch', 'book'), name='unique_branch_stock'),
+        ),
+        migrations.RunPython(stock_main_branch, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_branches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='output',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='payload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
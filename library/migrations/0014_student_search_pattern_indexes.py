@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:47
+
+import django.db.models.functions.text
+import library.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_job_heartbeat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='student',
+            name='student_name_upper_idx',
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('registration_no'), name='student_regno_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=library.models.PrefixSearchIndex(django.db.models.functions.text.Upper('name'), name='student_name_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:01
+
+import django.db.models.functions.text
+import library.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_student_search_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(django.db.models.functions.text.Upper('isbn'), name='book_isbn_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=library.models.PrefixSearchIndex(django.db.models.functions.text.Upper('title'), name='book_title_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=library.models.PrefixSearchIndex(django.db.models.functions.text.Upper('author_name'), name='book_author_prefix_idx'),
+        ),
+    ]
@@ -1,10 +1,72 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import OpClass
+from django.db.models.functions import Upper
+from django.utils import timezone
 from datetime import date
 
 
+class Branch(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    code = models.SlugField(max_length=20, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+_main_branch = {}
+
+
+def default_branch():
+    """
+    Primary key of the main branch, created on first use. It is the field
+    default for every branch FK, so the key is remembered per process
+    rather than looked up for each new Student or Issue instance.
+    """
+    if 'pk' not in _main_branch:
+        _main_branch['pk'] = Branch.objects.get_or_create(code='main', defaults={'name': 'Main Library'})[0].pk
+    return _main_branch['pk']
+
+
+def forget_default_branch(**kwargs):
+    _main_branch.clear()
+
+
+# Look the main branch up again if it is deleted, or after migrate/flush.
+models.signals.post_delete.connect(forget_default_branch, sender=Branch)
+models.signals.post_migrate.connect(forget_default_branch)
+
+
+class BranchQuerySet(models.QuerySet):
+    def for_branch(self, branch):
+        """Rows of ``branch`` (a Branch or its id); ``None`` means every branch."""
+        return self if branch is None else self.filter(branch=branch)
+
+
+class PrefixSearchIndex(models.Index):
+    """
+    Expression index that ``istartswith`` lookups can use. PostgreSQL only
+    serves ``LIKE 'abc%'`` from an index built with a pattern operator
+    class, so there each expression gets ``varchar_pattern_ops``; other
+    databases (SQLite in development) get a plain expression index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        index = self
+        if schema_editor.connection.vendor == 'postgresql':
+            index = models.Index(
+                *(OpClass(expression, name='varchar_pattern_ops') for expression in self.expressions), name=self.name,
+            )
+        return models.Index.create_sql(index, model, schema_editor, using=using, **kwargs)
+
+
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    # Home branch: where the student borrows, and what their catalogue shows.
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, default=default_branch, db_index=False, related_name='students')
     name = models.CharField(max_length=100)
     registration_no = models.CharField(max_length=30, unique=True)
     roll = models.CharField(max_length=10)
@@ -12,24 +74,72 @@ class Student(models.Model):
     season = models.CharField(max_length=50)
     semester = models.CharField(max_length=20)
     shift = models.CharField(max_length=20)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', 'semester', 'name'], name='student_dept_sem_idx'),
+            models.Index(fields=['branch', 'name'], name='student_branch_idx'),
+            # Serve the student search: registration_no__iexact and name__istartswith.
+            models.Index(Upper('registration_no'), name='student_regno_upper_idx'),
+            PrefixSearchIndex(Upper('name'), name='student_name_prefix_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
 
+class BookQuerySet(models.QuerySet):
+    def for_branch(self, branch):
+        """
+        Books stocked at ``branch``, annotated with ``branch_quantity`` and
+        ``branch_available``. ``None`` means the whole network, where the
+        branch figures are the precomputed network totals.
+        """
+        if branch is None:
+            return self.annotate(branch_quantity=models.F('quantity'), branch_available=models.F('available_copies'))
+        return self.filter(stock__branch=branch).annotate(
+            branch_quantity=models.F('stock__quantity'),
+            branch_available=models.F('stock__available_copies'),
+        )
+
+
+class ActiveBookManager(models.Manager.from_queryset(BookQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_retired=False)
+
+
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author_name = models.CharField(max_length=100)
     isbn = models.CharField(max_length=13, unique=True)
     book_type = models.CharField(max_length=50)
+    # Network-wide totals, kept equal to the sum of this book's BranchStock
+    # rows so cross-branch availability is a single-row lookup.
     quantity = models.IntegerField(default=1)
     available_copies = models.IntegerField(default=1)
+    # Retired books stay in the table (and in loan history) but are hidden
+    # from Book.objects; `manage.py purge_retired_books` removes them for good.
+    is_retired = models.BooleanField(default=False)
+    retired_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveBookManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title'], condition=models.Q(is_retired=False), name='book_catalogue_idx'),
+            # Serve the admin book search and autocomplete: isbn__iexact and
+            # title/author_name__istartswith.
+            models.Index(Upper('isbn'), name='book_isbn_upper_idx'),
+            PrefixSearchIndex(Upper('title'), name='book_title_prefix_idx'),
+            PrefixSearchIndex(Upper('author_name'), name='book_author_prefix_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.pk is None:
             self.available_copies = self.quantity
         else:
-            old_book = Book.objects.get(pk=self.pk)
+            old_book = Book.all_objects.get(pk=self.pk)
             quantity_difference = self.quantity - old_book.quantity
             self.available_copies += quantity_difference
             if self.available_copies < 0:
@@ -40,7 +150,26 @@ class Book(models.Model):
         return self.title
 
 
+class BranchStock(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, db_index=False, related_name='stock')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='stock')
+    quantity = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+
+    objects = BranchQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Leads with the branch, so it also serves per-branch catalogue scans.
+            models.UniqueConstraint(fields=['branch', 'book'], name='unique_branch_stock'),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title} at {self.branch.name} ({self.available_copies}/{self.quantity})"
+
+
 class Issue(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, default=default_branch, db_index=False, related_name='+')
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     issue_date = models.DateField(auto_now_add=True)
@@ -49,6 +178,18 @@ class Issue(models.Model):
     return_date = models.DateField(null=True, blank=True)
 
     FINE_PER_DAY = 10 
+
+    objects = BranchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'is_returned', 'due_date'], name='issue_branch_open_idx'),
+            models.Index(fields=['branch', 'issue_date'], name='issue_branch_date_idx'),
+            models.Index(fields=['is_returned', 'return_date'], name='issue_returned_idx'),
+            models.Index(fields=['is_returned', 'due_date'], name='issue_open_due_idx'),
+            models.Index(fields=['student', 'is_returned', 'due_date'], name='issue_student_open_idx'),
+            models.Index(fields=['issue_date'], name='issue_date_idx'),
+        ]
     
     @property
     def get_fine(self):
@@ -76,6 +217,7 @@ class Issue(models.Model):
 
 
 class BorrowRequest(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, default=default_branch, db_index=False, related_name='+')
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     request_date = models.DateField(auto_now_add=True)
@@ -87,6 +229,151 @@ class BorrowRequest(models.Model):
         ('Completed', 'Completed'),
     ]
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    # Set when approval was refused because no copies were left; counted as lost demand.
+    out_of_stock = models.BooleanField(default=False)
+
+    objects = BranchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'status', 'request_date'], name='borrowrequest_branch_idx'),
+            models.Index(fields=['status', 'request_date'], name='borrowrequest_status_idx'),
+            models.Index(fields=['request_date'], name='borrowrequest_date_idx'),
+        ]
 
     def __str__(self):
         return f"Request for {self.book.title} by {self.student.name} ({self.status})"
+
+
+
+class IssueArchive(models.Model):
+    # Keeps the primary key of the archived Issue row. On PostgreSQL the table
+    # is range-partitioned by return_date (one partition per year), see
+    # migration 0002 and library.archive.ensure_partitions.
+    id = models.BigIntegerField(primary_key=True)
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, default=default_branch, db_index=False, related_name='+')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='archived_issues')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_issues')
+    issue_date = models.DateField()
+    due_date = models.DateField()
+    return_date = models.DateField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = BranchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['return_date'], name='issuearchive_return_idx'),
+            models.Index(fields=['branch', 'return_date'], name='issuearchive_branch_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title} returned by {self.student.name} (archived)"
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Succeeded', 'Succeeded'),
+        ('Failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Queued')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    progress = models.PositiveSmallIntegerField(default=0)
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Input and output files travel in the row itself, so the web and
+    # worker processes need no shared disk. Defer them when listing jobs.
+    payload = models.BinaryField(null=True, blank=True)
+    output = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_claim_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in ('Succeeded', 'Failed')
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class ReminderLog(models.Model):
+    KIND_CHOICES = [
+        ('due_soon', 'Due Soon'),
+        ('overdue', 'Overdue'),
+    ]
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # A renewal moves the due date, which makes the loan eligible again.
+    due_date = models.DateField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['issue', 'kind', 'due_date'], name='unique_reminder_per_due_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder for issue #{self.issue_id}"
+
+
+class BookRecommendation(models.Model):
+    # Rebuilt offline by `manage.py build_recommendations`.
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.recommended.title} (for {self.book.title}, #{self.rank})"
+
+
+class CirculationEvent(models.Model):
+    # Append-only: rows are never updated, and they outlive the books,
+    # students and loans they mention, hence no database constraints.
+    KIND_CHOICES = [
+        ('stock', 'Stock Change'),
+        ('issue', 'Issue'),
+        ('return', 'Return'),
+        ('renew', 'Renewal'),
+        ('reconcile', 'Reconciliation'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    student = models.ForeignKey(Student, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    issue_id = models.BigIntegerField(null=True, blank=True)
+    # Change applied to Book.available_copies by this event.
+    delta = models.IntegerField(default=0)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', 'created_at'], name='circulation_book_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of book #{self.book_id} ({self.delta:+d})"
@@ -0,0 +1,144 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Student, default_branch
+
+
+STUDENT_COLUMNS = ['name', 'registration_no', 'roll', 'department', 'season', 'semester', 'shift']
+CSV_COLUMNS = ['username', 'email', 'password'] + STUDENT_COLUMNS
+REQUIRED_COLUMNS = ['username', 'password'] + STUDENT_COLUMNS
+
+
+@dataclass
+class ImportResult:
+    valid: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+
+def _init_worker():
+    # Spawned workers (non-fork platforms) start without Django configured.
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None, chunksize=64):
+    """PBKDF2-hash ``passwords`` across a process pool, preserving order."""
+    passwords = list(passwords)
+    if workers == 1 or len(passwords) < chunksize:
+        return [make_password(p) for p in passwords]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def _max_length(model, name):
+    return model._meta.get_field(name).max_length
+
+
+def validate_rows(rows):
+    """
+    Check every row against one in-memory index of existing usernames and
+    registration numbers (and against earlier rows of the same file).
+    Returns ``(valid_rows, errors)`` where errors are ``(line, message)``.
+    """
+    usernames = set(User.objects.values_list('username', flat=True))
+    registration_nos = set(Student.objects.values_list('registration_no', flat=True))
+
+    valid, errors = [], []
+    for line, row in rows:
+        row = {key: (value or '').strip() for key, value in row.items() if key}
+        missing = [col for col in REQUIRED_COLUMNS if not row.get(col)]
+        if missing:
+            errors.append((line, f"Missing {', '.join(missing)}."))
+            continue
+
+        too_long = [
+            col for col in STUDENT_COLUMNS
+            if len(row[col]) > _max_length(Student, col)
+        ]
+        if len(row['username']) > _max_length(User, 'username'):
+            too_long.insert(0, 'username')
+        if too_long:
+            errors.append((line, f"Too long: {', '.join(too_long)}."))
+            continue
+
+        if row['username'] in usernames:
+            errors.append((line, f"Username '{row['username']}' already exists."))
+            continue
+        if row['registration_no'] in registration_nos:
+            errors.append((line, f"Registration No. '{row['registration_no']}' already exists."))
+            continue
+
+        usernames.add(row['username'])
+        registration_nos.add(row['registration_no'])
+        valid.append(row)
+    return valid, errors
+
+
+def read_csv(file):
+    """Yield ``(line_number, row)`` pairs from a CSV file opened in text mode."""
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def import_students(rows, workers=None, batch_size=1000, dry_run=False, progress=None, branch_id=None):
+    """
+    Create User and Student rows in bulk from ``(line, row)`` pairs, all
+    at ``branch_id`` (the main branch by default).
+
+    Passwords are hashed in parallel and all inserts happen in one
+    transaction, so either every valid row is created or none is.
+    ``progress(percent, message)`` is called between the stages.
+    """
+    progress = progress or (lambda percent, message: None)
+    started = time.monotonic()
+    valid, errors = validate_rows(rows)
+    result = ImportResult(valid=len(valid), errors=errors)
+    if dry_run or not valid:
+        result.elapsed = time.monotonic() - started
+        return result
+
+    progress(10, f"Hashing {len(valid)} passwords")
+    hashes = hash_passwords((row['password'] for row in valid), workers=workers)
+    progress(80, f"Inserting {len(valid)} students")
+    users = [
+        User(username=row['username'], email=row.get('email', ''), password=hashed)
+        for row, hashed in zip(valid, hashes)
+    ]
+
+    branch_id = branch_id or default_branch()
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size)
+        if any(user.pk is None for user in users):
+            ids = dict(
+                User.objects.filter(username__in=[user.username for user in users])
+                .values_list('username', 'id')
+            )
+            for user in users:
+                user.pk = ids[user.username]
+        Student.objects.bulk_create(
+            [
+                Student(user=user, branch_id=branch_id, **{col: row[col] for col in STUDENT_COLUMNS})
+                for row, user in zip(valid, users)
+            ],
+            batch_size=batch_size,
+        )
+
+    result.created = len(users)
+    result.elapsed = time.monotonic() - started
+    return result
@@ -0,0 +1,58 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact ``COUNT(*)`` over a whole large table.
+
+    For an unfiltered queryset the row count comes from the planner
+    statistics (``pg_class.reltuples`` on PostgreSQL, ``sqlite_stat1`` on
+    SQLite once ANALYZE has run). Filtered querysets, small tables and
+    backends without statistics fall back to the exact count.
+    """
+
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.has_filters():
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+def estimate_row_count(model, using='default'):
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Partitioned parents report -1; their partitions carry the stats.
+            cursor.execute(
+                """
+                SELECT SUM(GREATEST(c.reltuples, 0))::bigint
+                FROM pg_class c
+                WHERE c.oid = %s::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                """,
+                [table, table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # One row per index (plus an idx IS NULL row only for tables
+            # without any); the first number of ``stat`` is the row count.
+            # Partial indexes cover fewer rows, so take the largest.
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat]
+            return max(counts) if counts else None
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    return int(row[0])
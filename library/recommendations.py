@@ -0,0 +1,150 @@
+import time
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import BookRecommendation, Issue, IssueArchive
+
+
+FETCH_SIZE = 100_000
+
+
+def load_loans():
+    """
+    Return ``(student_ids, book_ids)`` NumPy arrays for every loan, live and
+    archived, fetched with a raw cursor in large batches instead of
+    building a model instance per row.
+    """
+    import numpy as np
+
+    loans = Issue.objects.values_list('student_id', 'book_id').union(
+        IssueArchive.objects.values_list('student_id', 'book_id'), all=True,
+    )
+    sql, params = loans.query.sql_with_params()
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.concatenate(chunks)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def top_k_neighbours(student_ids, book_ids, top_k=10, min_support=2, metric='cosine', block_size=2000):
+    """
+    Build a binary student x book matrix and score every pair of books by
+    how many students borrowed both (``metric='count'``) or by the cosine
+    of their borrower vectors. The book x book product is computed in
+    blocks of ``block_size`` rows so memory stays bounded.
+
+    Returns ``(book, recommended, rank, score)`` arrays holding book ids.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    empty = np.empty(0, dtype=np.int64)
+    if not len(book_ids):
+        return empty, empty, empty, np.empty(0)
+
+    students, student_idx = np.unique(student_ids, return_inverse=True)
+    books, book_idx = np.unique(book_ids, return_inverse=True)
+    borrowed = sparse.csr_matrix(
+        (np.ones(len(book_idx), dtype=np.float32), (student_idx, book_idx)),
+        shape=(len(students), len(books)),
+    )
+    borrowed.sum_duplicates()
+    borrowed.data[:] = 1  # a student borrowing a book twice counts once
+    by_book = borrowed.T.tocsr()
+    popularity = np.asarray(by_book.sum(axis=1)).ravel()
+
+    results = []
+    for start in range(0, len(books), block_size):
+        co = (by_book[start:start + block_size] @ borrowed).tocoo()
+        rows = co.row.astype(np.int64) + start
+        keep = (rows != co.col) & (co.data >= min_support)
+        rows, cols, scores = rows[keep], co.col[keep], co.data[keep].astype(np.float64)
+        if metric == 'cosine':
+            scores = scores / np.sqrt(popularity[rows] * popularity[cols])
+
+        # Sort by book then best score first; the position inside each
+        # book's run is its rank.
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        run_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        run_lengths = np.diff(np.r_[run_starts, len(rows)])
+        ranks = np.arange(len(rows)) - np.repeat(run_starts, run_lengths)
+        keep = ranks < top_k
+        results.append((books[rows[keep]], books[cols[keep]], ranks[keep] + 1, scores[keep]))
+
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+@transaction.atomic
+def store_recommendations(book, recommended, rank, score, batch_size=5000):
+    BookRecommendation.objects.all().delete()
+    BookRecommendation.objects.bulk_create(
+        (
+            BookRecommendation(book_id=b, recommended_id=r, rank=k, score=s)
+            for b, r, k, s in zip(book.tolist(), recommended.tolist(), rank.tolist(), score.tolist())
+        ),
+        batch_size=batch_size,
+    )
+    return len(book)
+
+
+def build_recommendations(top_k=10, min_support=2, metric='cosine', progress=None):
+    """Rebuild BookRecommendation from the full loan history. Returns timing stats."""
+    progress = progress or (lambda percent, message: None)
+    started = time.monotonic()
+
+    student_ids, book_ids = load_loans()
+    loaded = time.monotonic()
+    progress(30, f"Loaded {len(book_ids)} loans")
+
+    neighbours = top_k_neighbours(student_ids, book_ids, top_k=top_k, min_support=min_support, metric=metric)
+    computed = time.monotonic()
+    progress(70, f"Computed {len(neighbours[0])} recommendations")
+
+    stored = store_recommendations(*neighbours)
+    return {
+        'loans': len(book_ids),
+        'recommendations': stored,
+        'load_seconds': round(loaded - started, 2),
+        'compute_seconds': round(computed - loaded, 2),
+        'store_seconds': round(time.monotonic() - computed, 2),
+    }
+
+
+def recommendations_for_student(student, limit=6):
+    """
+    Books stocked at the student's branch that were borrowed alongside
+    their loans and that they have not borrowed yet, each annotated with
+    ``branch_available`` as Book.objects.for_branch() does.
+    """
+    # Archived loans count too; once old loans are archived they are all
+    # some students have.
+    borrowed = set(Issue.objects.filter(student=student).values_list('book_id', flat=True))
+    borrowed.update(IssueArchive.objects.filter(student=student).values_list('book_id', flat=True))
+    candidates = (
+        BookRecommendation.objects.filter(
+            book_id__in=borrowed, recommended__is_retired=False, recommended__stock__branch=student.branch_id,
+        )
+        .exclude(recommended_id__in=borrowed)
+        .annotate(branch_available=F('recommended__stock__available_copies'))
+        .select_related('recommended')
+        .order_by('-score')[:limit * 4]
+    )
+    picked = {}
+    for rec in candidates:
+        if rec.recommended_id not in picked:
+            # Borrowing is checked against this branch's shelf, not the network total.
+            rec.recommended.branch_available = rec.branch_available
+            picked[rec.recommended_id] = rec.recommended
+        if len(picked) == limit:
+            break
+    return list(picked.values())
@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+
+from .models import Issue, ReminderLog
+
+
+SUBJECTS = {
+    'due_soon': "Library reminder: books due soon",
+    'overdue': "Library notice: overdue books",
+}
+
+
+def pending_reminders(kind, today=None, days_before=None):
+    """
+    Open loans that need a ``kind`` reminder and have not had one for their
+    current due date. One query per window, served by issue_open_due_idx.
+    """
+    today = today or date.today()
+    if days_before is None:
+        days_before = settings.REMINDER_DAYS_BEFORE
+
+    issues = Issue.objects.filter(is_returned=False)
+    if kind == 'due_soon':
+        issues = issues.filter(due_date__gte=today, due_date__lte=today + timedelta(days=days_before))
+    else:
+        issues = issues.filter(due_date__lt=today)
+
+    already_sent = ReminderLog.objects.filter(issue=OuterRef('pk'), kind=kind, due_date=OuterRef('due_date'))
+    return (
+        issues.exclude(student__user__email='')
+        .filter(~Exists(already_sent))
+        .select_related('book', 'student__user')
+        .order_by('student_id', 'due_date')
+    )
+
+
+def build_messages(kind, issues, connection=None):
+    """Render one message per student covering all of their loans in this window."""
+    batches = []
+    for student, loans in groupby(issues, key=lambda issue: issue.student):
+        loans = list(loans)
+        body = render_to_string('library/emails/reminder.txt', {
+            'kind': kind,
+            'student': student,
+            'loans': loans,
+            'total_fine': sum(issue.get_fine for issue in loans),
+        })
+        message = EmailMessage(SUBJECTS[kind], body, to=[student.user.email], connection=connection)
+        batches.append((message, loans))
+    return batches
+
+
+def send_reminders(kinds=('due_soon', 'overdue'), today=None, days_before=None, chunk_size=100, dry_run=False, progress=None):
+    """
+    Email due-soon and overdue reminders over a single reused connection,
+    ``chunk_size`` messages at a time. Each chunk is logged in ReminderLog
+    right after it is sent, so a rerun only picks up what is still missing.
+    Returns ``{kind: messages_sent}``; with ``dry_run``, the number that
+    would be sent, without connecting to the mail server.
+    """
+    today = today or date.today()
+    if dry_run:
+        return {kind: len(build_messages(kind, pending_reminders(kind, today, days_before))) for kind in kinds}
+
+    sent = {}
+    connection = get_connection()
+    connection.open()
+    try:
+        for kind in kinds:
+            batches = build_messages(kind, pending_reminders(kind, today, days_before), connection)
+            sent[kind] = 0
+            for start in range(0, len(batches), chunk_size):
+                chunk = batches[start:start + chunk_size]
+                connection.send_messages([message for message, _ in chunk])
+                ReminderLog.objects.bulk_create(
+                    [
+                        ReminderLog(issue=issue, kind=kind, due_date=issue.due_date)
+                        for _, loans in chunk for issue in loans
+                    ],
+                    ignore_conflicts=True,
+                )
+                sent[kind] += len(chunk)
+                if progress:
+                    progress(kind, sent[kind], len(batches))
+    finally:
+        connection.close()
+    return sent
@@ -0,0 +1,52 @@
+import csv
+from datetime import date
+
+from .archive import returned_history
+from .branches import branch_filter
+from .models import Issue
+
+
+CIRCULATION_HEADER = ['Status', 'Book Title', 'ISBN', 'Student', 'Reg. No.', 'Issue Date', 'Due Date', 'Return Date', 'Fine (Tk.)']
+
+
+def write_circulation_csv(out, progress=None, branch=None):
+    """
+    Write open loans followed by the full returned history (live and
+    archived) to ``out``, for one ``branch`` (an id) or all of them.
+    Rows are streamed with ``iterator()`` so memory stays flat however
+    long the history is. Returns the number of rows.
+    """
+    writer = csv.writer(out)
+    writer.writerow(CIRCULATION_HEADER)
+    today = date.today()
+    rows = 0
+
+    open_issues = (
+        Issue.objects.for_branch(branch).filter(is_returned=False)
+        .select_related('book', 'student')
+        .order_by('due_date')
+    )
+    for issue in open_issues.iterator(chunk_size=2000):
+        writer.writerow([
+            'Overdue' if issue.due_date < today else 'Issued',
+            issue.book.title, issue.book.isbn,
+            issue.student.name, issue.student.registration_no,
+            issue.issue_date, issue.due_date, '', issue.get_fine,
+        ])
+        rows += 1
+    if progress:
+        progress(rows)
+
+    for issue in returned_history(**branch_filter(branch)).order_by('-return_date').iterator(chunk_size=2000):
+        late_days = (issue['return_date'] - issue['due_date']).days if issue['return_date'] else 0
+        writer.writerow([
+            'Returned',
+            issue['book_title'], issue['book_isbn'],
+            issue['student_name'], issue['registration_no'],
+            issue['issue_date'], issue['due_date'], issue['return_date'],
+            max(late_days, 0) * Issue.FINE_PER_DAY,
+        ])
+        rows += 1
+        if progress and rows % 10000 == 0:
+            progress(rows)
+    return rows
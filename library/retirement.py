@@ -0,0 +1,73 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .archive import archive_returned_issues
+from .models import Book, BookRecommendation, BorrowRequest, BranchStock, Issue, IssueArchive, ReminderLog
+
+
+def retire_book(book):
+    """
+    Hide ``book`` from the catalogue straight away. Only two small UPDATEs
+    run here; the loan history is left for purge_book to clear later.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Book.all_objects.filter(pk=book.pk).update(is_retired=True, retired_at=now)
+        BorrowRequest.objects.filter(book=book, status='Pending').update(status='Rejected')
+    book.is_retired = True
+    book.retired_at = now
+
+
+def delete_in_chunks(queryset, chunk_size=5000):
+    """
+    Delete the rows of ``queryset`` with plain ``DELETE ... WHERE pk IN``
+    statements of ``chunk_size`` rows, each committed in its own short
+    transaction, so no model instances are loaded and locks are held only
+    briefly. Call it outside ``atomic()``, or the chunks become savepoints
+    of one long transaction.
+    """
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({', '.join(['%s'] * len(ids))})", ids)
+            deleted += cursor.rowcount
+
+
+def purge_book(book_id, chunk_size=5000, keep_history=False):
+    """
+    Remove a retired book's history and then the book itself, committing
+    chunk by chunk. Rows referring to the book go before the Book row, so
+    if this stops part way the book is still there, retired and hidden,
+    and running it again (the purge_book job retries) carries on with
+    whatever is left.
+
+    With ``keep_history`` its returned loans are moved to IssueArchive
+    instead, and the retired Book row is kept for the archive to point at.
+    Returns ``{table: rows}`` counts for this run.
+    """
+    book = Book.all_objects.get(pk=book_id, is_retired=True)
+    if Issue.objects.filter(book=book, is_returned=False).exists():
+        raise ValueError(f"Book #{book_id} still has copies issued out.")
+
+    counts = {}
+    counts['recommendations'] = delete_in_chunks(BookRecommendation.objects.filter(book=book), chunk_size)
+    counts['recommendations'] += delete_in_chunks(BookRecommendation.objects.filter(recommended=book), chunk_size)
+    counts['borrow_requests'] = delete_in_chunks(BorrowRequest.objects.filter(book=book), chunk_size)
+
+    if keep_history:
+        # A negative age makes everything returned up to today eligible.
+        counts['archived_issues'] = archive_returned_issues(older_than_days=-1, chunk_size=chunk_size, book=book)
+        return counts
+
+    counts['reminders'] = delete_in_chunks(ReminderLog.objects.filter(issue__book=book), chunk_size)
+    counts['issues'] = delete_in_chunks(Issue.objects.filter(book=book), chunk_size)
+    counts['archived_issues'] = delete_in_chunks(IssueArchive.objects.filter(book=book), chunk_size)
+    counts['branch_stock'] = delete_in_chunks(BranchStock.objects.filter(book=book), chunk_size)
+    counts['books'] = delete_in_chunks(Book.all_objects.filter(pk=book.pk))
+    return counts
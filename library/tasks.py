@@ -0,0 +1,110 @@
+import io
+
+from .analytics import DemandReport
+from .archive import archive_returned_issues
+from .jobs import report_progress, task
+from .models import Job
+from .ledger import find_drift, repair_drift
+from .onboarding import import_students, read_csv
+from .recommendations import build_recommendations
+from .reminders import send_reminders
+from .retirement import purge_book
+from .reports import write_circulation_csv
+
+
+def save_job_file(job, prefix, content):
+    """Keep ``content`` (bytes) as the job's downloadable output and return its file name."""
+    Job.objects.filter(pk=job.pk).update(output=content)
+    return f"{prefix}-{job.pk}.csv"
+
+
+@task('import_students')
+def import_students_job(job, dry_run=False, branch_id=None):
+    csv_file = io.TextIOWrapper(io.BytesIO(bytes(job.payload or b'')), encoding='utf-8-sig', newline='')
+    result = import_students(
+        read_csv(csv_file),
+        dry_run=dry_run,
+        progress=lambda percent, message: report_progress(job, percent, message=message),
+        branch_id=branch_id,
+    )
+    # The upload is not needed once the students exist (kept for retries until then).
+    Job.objects.filter(pk=job.pk).update(payload=None)
+    return {
+        'valid': result.valid,
+        'created': result.created,
+        'elapsed': round(result.elapsed, 2),
+        'rows_per_sec': round(result.rows_per_sec, 1),
+        'errors': result.errors,
+    }
+
+
+@task('archive_issues')
+def archive_issues_job(job, older_than_days=None, chunk_size=1000):
+    archived = archive_returned_issues(
+        older_than_days=older_than_days,
+        chunk_size=chunk_size,
+        progress=lambda archived: report_progress(job, 50, message=f"{archived} loans archived"),
+    )
+    return {'archived': archived}
+
+
+@task('circulation_report')
+def circulation_report_job(job, branch_id=None):
+    out = io.StringIO()
+    rows = write_circulation_csv(
+        out, progress=lambda rows: report_progress(job, 50, message=f"{rows} rows written"), branch=branch_id,
+    )
+    return {'rows': rows, 'file': save_job_file(job, 'circulation-report', out.getvalue().encode('utf-8'))}
+
+
+@task('demand_report')
+def demand_report_job(job, window_days=365, branch_id=None):
+    report_progress(job, 10, message="Loading loans and requests")
+    report = DemandReport(window_days=window_days, branch=branch_id)
+    report_progress(job, 60, message="Writing CSV")
+    out = io.StringIO()
+    rows = report.write_csv(out)
+    books_short = int((report.recommended > report.quantity).sum())
+    return {
+        'books': rows,
+        'books_short': books_short,
+        'file': save_job_file(job, f'book-demand-{report.today}', out.getvalue().encode('utf-8')),
+        # What the demand report page shows.
+        'report': {
+            'today': report.today.isoformat(),
+            'target_utilization': int(report.target_utilization * 100),
+            'rows': list(report.rows(limit=200)),
+            'seasonal_rows': list(report.seasonal_rows()),
+            'total_books': rows,
+            'books_short': books_short,
+        },
+    }
+
+
+@task('send_reminders')
+def send_reminders_job(job, days_before=None):
+    return send_reminders(
+        days_before=days_before,
+        progress=lambda kind, sent, total: report_progress(job, sent, total, message=f"{sent}/{total} {kind} reminders sent"),
+    )
+
+
+@task('build_recommendations')
+def build_recommendations_job(job, top_k=10, min_support=2, metric='cosine'):
+    return build_recommendations(
+        top_k=top_k,
+        min_support=min_support,
+        metric=metric,
+        progress=lambda percent, message: report_progress(job, percent, message=message),
+    )
+
+
+@task('reconcile_inventory')
+def reconcile_inventory_job(job, repair=True):
+    drift = find_drift()
+    return {'drifted': len(drift), 'repaired': repair_drift(drift) if repair else 0}
+
+
+@task('purge_book')
+def purge_book_job(job, book_id, keep_history=False):
+    return purge_book(book_id, keep_history=keep_history)
@@ -1,3 +1,1002 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.core.mail.backends import locmem
+from django.db import connection, transaction
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresWrapper
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import events, throttling
+from .analytics import DemandReport
+from .archive import archive_returned_issues, returned_history
+from .branches import refresh_book_totals
+from .checks import events_cache_warnings
+from .forms import RenewBookForm
+from . import jobs
+from .jobs import claim_job, enqueue, requeue_stale_jobs, run_job, run_worker
+from .ledger import LedgerWriter, find_drift
+from .models import (
+    Book, BookRecommendation, Branch, BranchStock, CirculationEvent, Issue, IssueArchive, Job, ReminderLog, Student, default_branch
+)
+from .onboarding import import_students
+from .paginators import estimate_row_count
+from .recommendations import recommendations_for_student, top_k_neighbours
+from .reminders import send_reminders
+from .retirement import purge_book, retire_book
+from .startup import precompile_templates
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/min'), (10, 10 / 60))
+        self.assertEqual(throttling.parse_rate('3/15s'), (3, 3 / 15))
+        with self.assertRaises(ValueError):
+            throttling.parse_rate('3/fortnight')
+
+    def check_bucket(self, store):
+        capacity, per_second = throttling.parse_rate('3/min')
+        results = [store.consume('k', capacity, per_second, now=1000) for _ in range(4)]
+        self.assertEqual(results[:3], [0, 0, 0])
+        self.assertEqual(results[3], 20)
+        # One token comes back every 20 seconds.
+        self.assertEqual(store.consume('k', capacity, per_second, now=1020), 0)
+        self.assertGreater(store.consume('k', capacity, per_second, now=1020), 0)
+        self.assertEqual(store.consume('other', capacity, per_second, now=1020), 0)
+
+    def test_local_store(self):
+        self.check_bucket(throttling.LocalStore())
+
+    def test_cache_store(self):
+        cache.clear()
+        self.check_bucket(throttling.CacheStore())
+
+
+@override_settings(
+    THROTTLE_STORE='local',
+    THROTTLE_RATES={
+        'login': {'methods': ['POST'], 'ip': '3/min', 'user': '2/min'},
+        'borrow_request': {'ip': '100/min', 'user': '3/min'},
+    },
+)
+class ThrottleLoadTests(TestCase):
+    """Abusive clients are turned away cheaply while everyone else keeps normal latency."""
+
+    ABUSE_REQUESTS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='right-password')
+        cls.student = Student.objects.create(
+            user=cls.user, name='Reader', registration_no='R-1', roll='1',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+        cls.book = Book.objects.create(
+            title='Load Testing', author_name='A. Author', isbn='9780000000001',
+            book_type='Science', quantity=5, available_copies=5,
+        )
+
+    def setUp(self):
+        throttling.reset()
+
+    def timed_post(self, url, data, ip):
+        started = time.perf_counter()
+        response = self.client.post(url, data, REMOTE_ADDR=ip)
+        return response, time.perf_counter() - started
+
+    def test_login_flood_is_rejected_before_password_checks(self):
+        url = reverse('login')
+        allowed, rejected = [], []
+        for i in range(self.ABUSE_REQUESTS):
+            # A different username every time, so only the IP bucket stops it.
+            response, elapsed = self.timed_post(url, {'username': f'guess{i}', 'password': 'x'}, '10.0.0.66')
+            (rejected if response.status_code == 429 else allowed).append(elapsed)
+        self.assertEqual(len(allowed), 3)
+        self.assertEqual(len(rejected), self.ABUSE_REQUESTS - 3)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {'username': 'reader', 'password': 'x'}, REMOTE_ADDR='10.0.0.66')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        # A real user on another address still logs in at normal speed.
+        response, elapsed = self.timed_post(url, {'username': 'reader', 'password': 'right-password'}, '10.0.0.7')
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertLess(statistics.median(rejected), 0.02)
+        self.assertLess(elapsed, max(allowed) * 3 + 0.5)
+
+        counters = throttling.get_store().stats()
+        self.assertEqual(counters['login.ip.throttled'], self.ABUSE_REQUESTS - 2)
+
+    def test_login_user_bucket_spans_addresses(self):
+        url = reverse('login')
+        statuses = [
+            self.client.post(url, {'username': 'Reader', 'password': 'x'}, REMOTE_ADDR=f'10.0.1.{i}').status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 429, 429])
+        # Viewing the login page is never limited.
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.1.1').status_code, 200)
+
+    def test_borrow_request_flood_is_rejected_per_user(self):
+        self.client.force_login(self.user)
+        url = reverse('borrow_request', args=[self.book.id])
+        statuses = [self.client.get(url, REMOTE_ADDR='10.0.2.1').status_code for _ in range(50)]
+        self.assertEqual(statuses[:3], [302, 302, 302])
+        self.assertEqual(set(statuses[3:]), {429})
+
+        # Only the session lookup runs before the 429.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.2.1').status_code, 429)
+
+        admin = User.objects.create_superuser('boss', password='x')
+        self.client.force_login(admin)
+        counters = self.client.get(reverse('throttle_stats')).json()['counters']
+        self.assertEqual(counters['borrow_request.user.allowed'], 3)
+        self.assertEqual(counters['borrow_request.user.throttled'], 48)
+
+    @override_settings(THROTTLE_PROXY_COUNT=1)
+    def test_clients_behind_the_same_proxy_get_separate_buckets(self):
+        url = reverse('login')
+
+        def post(client_ip, attempt=0):
+            # The router connects from one address and appends the client's.
+            return self.client.post(
+                url, {'username': f'guess{attempt}', 'password': 'x'},
+                REMOTE_ADDR='10.1.0.1', HTTP_X_FORWARDED_FOR=f'203.0.113.9, {client_ip}',
+            ).status_code
+
+        self.assertEqual([post('198.51.100.1', i) for i in range(4)], [200, 200, 200, 429])
+        self.assertEqual(post('198.51.100.2'), 200)
+
+
+@override_settings(
+    THROTTLE_STORE='local',
+    THROTTLE_RATES={'login': {'methods': ['POST'], 'ip': '2/min'}},
+)
+class ThrottleAsgiTests(TestCase):
+
+    def setUp(self):
+        throttling.reset()
+
+    def test_middleware_is_not_adapted_under_asgi(self):
+        handler = ASGIHandler()
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            logging.getLogger('django.request').debug("Loading middleware")
+            handler.load_middleware(is_async=True)
+        self.assertFalse([line for line in logs.output if 'ThrottleMiddleware' in line])
+        # process_view is used as is, not wrapped to run in a thread.
+        self.assertTrue(any(
+            getattr(method, '__func__', None) is throttling.ThrottleMiddleware.aprocess_view
+            for method in handler._view_middleware
+        ))
+
+    async def test_login_is_throttled_under_asgi(self):
+        url = reverse('login')
+        statuses = [
+            (await self.async_client.post(url, {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.3.1')).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual((await self.async_client.get(url, REMOTE_ADDR='10.0.3.1')).status_code, 200)
+
+
+class RenewFormTests(TestCase):
+
+    def test_overdue_cutoff_is_today_not_import_day(self):
+        student = Student.objects.create(
+            user=User.objects.create_user('renewer'), name='Renewer', registration_no='R-2', roll='2',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+        book = Book.objects.create(
+            title='Dates', author_name='A. Author', isbn='9780000000002',
+            book_type='Science', quantity=1, available_copies=0,
+        )
+        issue = Issue.objects.create(book=book, student=student, due_date=date.today() + timedelta(days=1))
+        self.assertIn(issue, RenewBookForm().fields['issue_record'].queryset)
+
+        # Two days on, the same long-running worker must treat the loan as overdue.
+        later = date.today() + timedelta(days=2)
+        with mock.patch('library.forms.date', mock.Mock(today=mock.Mock(return_value=later))):
+            self.assertNotIn(issue, RenewBookForm().fields['issue_record'].queryset)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """
+    Cold start stays cheap: what a new web process imports, how long the
+    WSGI app takes to load and warm up, and how slow its first request is.
+    Each check runs in a fresh interpreter. The budgets leave a wide margin
+    over a typical laptop (about 0.4s of imports, 0.5s to boot, under 10ms
+    for the first page) so only a real regression trips them.
+    """
+
+    IMPORT_BUDGET = 1.5
+    BOOT_BUDGET = 3.0
+    FIRST_REQUEST_BUDGET = 0.25
+    # Heavy libraries only the analytics and recommendation jobs need.
+    LAZY_MODULES = ['numpy', 'scipy', 'pandas', 'uvicorn']
+
+    def run_python(self, *args):
+        env = dict(
+            os.environ, DJANGO_SETTINGS_MODULE='library_project.settings',
+            DATABASE_URL='sqlite://:memory:', DEBUG='False', ALLOWED_HOSTS='testserver',
+        )
+        return subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, timeout=60, check=True,
+        )
+
+    def test_import_time(self):
+        result = self.run_python(
+            '-X', 'importtime', '-c',
+            'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns',
+        )
+        total, modules = 0, set()
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            modules.add(name.strip())
+            # Top-level imports are indented by one space; their cumulative
+            # time already includes everything they pulled in.
+            if not name.startswith('  '):
+                total += int(cumulative)
+        self.assertIn('library.views', modules)
+        self.assertLess(total / 1e6, self.IMPORT_BUDGET)
+        for module in self.LAZY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def test_boot_and_first_request(self):
+        script = (
+            'import json, time\n'
+            'from wsgiref.util import setup_testing_defaults\n'
+            'started = time.perf_counter()\n'
+            'from library_project.wsgi import application\n'
+            'booted = time.perf_counter()\n'
+            'environ = {"PATH_INFO": "/login/", "HTTP_HOST": "testserver"}\n'
+            'setup_testing_defaults(environ)\n'
+            'statuses = []\n'
+            'body = b"".join(application(environ, lambda status, headers: statuses.append(status)))\n'
+            'done = time.perf_counter()\n'
+            'print(json.dumps({"boot": booted - started, "first": done - booted, "status": statuses[0]}))\n'
+        )
+        timings = json.loads(self.run_python('-c', script).stdout.splitlines()[-1])
+        self.assertEqual(timings['status'], '200 OK')
+        self.assertLess(timings['boot'], self.BOOT_BUDGET)
+        self.assertLess(timings['first'], self.FIRST_REQUEST_BUDGET)
+
+    def test_templates_compiled_once(self):
+        self.assertGreater(precompile_templates(), 0)
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('library/base.html', loader.get_template_cache)
+
+
+class RegistrationTests(TestCase):
+
+    def registration_data(self, **extra):
+        data = {
+            'username': 'newreader', 'email': 'new@example.com',
+            'password': 'S3cure-pass!', 'confirm_password': 'S3cure-pass!',
+            'name': 'New Reader', 'registration_no': 'REG-9', 'roll': '9',
+            'department': 'CSE', 'season': '2026', 'semester': '1st', 'shift': '1st',
+        }
+        data.update(extra)
+        return data
+
+    def test_student_registers_at_chosen_branch(self):
+        default_branch()
+        north = Branch.objects.create(name='North Campus', code='north')
+        page = self.client.get(reverse('register'))
+        self.assertContains(page, 'name="branch"')
+        self.assertContains(page, 'North Campus')
+
+        response = self.client.post(reverse('register'), self.registration_data(branch=north.pk))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(Student.objects.get(registration_no='REG-9').branch, north)
+
+    def test_missing_branch_is_reported(self):
+        response = self.client.post(reverse('register'), self.registration_data())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Student.objects.exists())
+        self.assertIn('branch', response.context['student_form'].errors)
+
+
+class PurgeBookTests(TransactionTestCase):
+    """Real commits, so what a failed purge leaves behind is what other connections would see."""
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Old Edition', author_name='A. Author', isbn='9780000000003',
+            book_type='Science', quantity=2, available_copies=2,
+        )
+        BranchStock.objects.create(branch_id=default_branch(), book=self.book, quantity=2, available_copies=2)
+        student = Student.objects.create(
+            user=User.objects.create_user('purger'), name='Purger', registration_no='R-3', roll='3',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+        Issue.objects.create(book=self.book, student=student, due_date=date.today(), is_returned=True)
+        retire_book(self.book)
+
+    def test_purge_removes_branch_stock_and_book(self):
+        counts = purge_book(self.book.pk)
+        self.assertEqual(counts['branch_stock'], 1)
+        self.assertEqual(counts['books'], 1)
+        self.assertFalse(Book.all_objects.filter(pk=self.book.pk).exists())
+        self.assertFalse(Issue.objects.filter(book_id=self.book.pk).exists())
+
+    def test_failed_purge_can_be_resumed(self):
+        with mock.patch('library.retirement.BranchStock.objects.filter', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                purge_book(self.book.pk)
+        # The chunks already done stay committed; the book waits, retired, for the rerun.
+        self.assertFalse(Issue.objects.filter(book=self.book).exists())
+        self.assertTrue(Book.all_objects.filter(pk=self.book.pk, is_retired=True).exists())
+
+        counts = purge_book(self.book.pk)
+        self.assertEqual((counts['issues'], counts['branch_stock'], counts['books']), (0, 1, 1))
+        self.assertFalse(Book.all_objects.filter(pk=self.book.pk).exists())
+
+    def test_retiring_from_the_catalogue_leaves_stock_unchanged(self):
+        self.client.force_login(User.objects.create_superuser('boss', password='x'))
+        book = Book.objects.create(
+            title='Current Edition', author_name='A. Author', isbn='9780000000013',
+            book_type='Science', quantity=3, available_copies=3,
+        )
+        self.client.post(reverse('delete_book', args=[book.pk]))
+        event = CirculationEvent.objects.get(book_id=book.pk, note="Book retired")
+        self.assertEqual(event.delta, 0)
+
+
+class JobFileTests(TestCase):
+    """Job inputs and outputs live in the Job row, not on the web dyno's disk."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('librarian', password='x')
+        self.client.force_login(self.admin)
+
+    def test_import_upload_travels_with_the_job(self):
+        rows = 'username,email,password,name,registration_no,roll,department,season,semester,shift\n'
+        rows += 'imported1,,pw-12345,Imported One,IMP-1,1,CSE,2026,1st,1st\n'
+        upload = SimpleUploadedFile('students.csv', rows.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(reverse('import_students'), {'csv_file': upload})
+        job = Job.objects.get(name='import_students')
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]), fetch_redirect_response=False)
+        self.assertEqual(bytes(job.payload), rows.encode('utf-8'))
+
+        self.assertEqual(run_worker(burst=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Succeeded', job.error)
+        self.assertEqual(job.result['created'], 1)
+        self.assertIsNone(job.payload)
+        self.assertTrue(Student.objects.filter(registration_no='IMP-1').exists())
+
+    def test_report_download_comes_from_the_job_row(self):
+        job = enqueue('circulation_report', owner=self.admin)
+        run_worker(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Succeeded', job.error)
+
+        response = self.client.get(reverse('job_download', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'circulation-report-{job.id}.csv', response['Content-Disposition'])
+        self.assertEqual(response.content, bytes(job.output))
+
+
+def failing_task(job):
+    raise RuntimeError("boom")
+
+
+def slow_task(job, seconds):
+    time.sleep(seconds)
+    return {'slept': seconds}
+
+
+@override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=30, JOB_STALE_AFTER=300)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.TASKS, {'fail': failing_task, 'slow': slow_task})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claim_takes_oldest_runnable_job_once(self):
+        now = timezone.now()
+        later = enqueue('slow', seconds=0, run_at=now + timedelta(hours=1))
+        second = enqueue('slow', seconds=0, run_at=now - timedelta(minutes=1))
+        first = enqueue('slow', seconds=0, run_at=now - timedelta(minutes=2))
+
+        job = claim_job('worker-a')
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('Running', 1, 'worker-a'))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertEqual(claim_job('worker-b').pk, second.pk)
+        # The future job is not due yet.
+        self.assertIsNone(claim_job('worker-c'))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, 'Queued')
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        enqueue('fail')
+        with self.assertLogs('library.jobs', 'ERROR'):
+            job = run_job(claim_job('w'))
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('Queued', 1, ''))
+        self.assertIn('boom', job.error)
+        self.assertAlmostEqual((job.run_at - job.finished_at).total_seconds(), 30)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('library.jobs', 'ERROR'):
+            job = run_job(claim_job('w'))
+        self.assertEqual((job.status, job.attempts), ('Failed', 2))
+        self.assertIsNone(claim_job('w'))
+
+    def test_only_jobs_without_recent_heartbeat_are_requeued(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        alive = enqueue('slow', seconds=0)
+        dead = enqueue('slow', seconds=0)
+        exhausted = enqueue('slow', seconds=0, max_attempts=1)
+        Job.objects.update(status='Running', started_at=long_ago, attempts=1, locked_by='w')
+        # Running for two hours, but its worker checked in just now.
+        Job.objects.filter(pk=alive.pk).update(heartbeat_at=timezone.now())
+        Job.objects.filter(pk__in=[dead.pk, exhausted.pk]).update(heartbeat_at=long_ago)
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, 'Running')
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, 'Queued')
+        self.assertEqual(Job.objects.get(pk=exhausted.pk).status, 'Failed')
+
+
+@override_settings(JOB_HEARTBEAT_INTERVAL=0.05)
+class JobHeartbeatTests(TransactionTestCase):
+    # No wrapping transaction, so the heartbeat thread's writes go through.
+
+    def test_running_job_sends_heartbeats(self):
+        with mock.patch.dict(jobs.TASKS, {'slow': slow_task}):
+            enqueue('slow', seconds=0.3)
+            job = claim_job('w')
+            claimed_at = job.heartbeat_at
+            job = run_job(job)
+        self.assertEqual(job.status, 'Succeeded')
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, claimed_at)
+
+
+class DefaultBranchTests(TestCase):
+
+    def test_new_instances_do_not_query_for_the_main_branch(self):
+        main = default_branch()
+        with self.assertNumQueries(0):
+            students = [Student(name=f'S{i}') for i in range(50)]
+        self.assertEqual({student.branch_id for student in students}, {main})
+
+    def test_import_puts_every_student_at_one_branch(self):
+        north = Branch.objects.create(name='North Campus', code='north')
+        rows = [
+            (i + 2, {
+                'username': f'bulk{i}', 'password': 'pw-12345', 'name': f'Bulk {i}', 'registration_no': f'B-{i}',
+                'roll': str(i), 'department': 'CSE', 'season': '2026', 'semester': '1st', 'shift': '1st',
+            })
+            for i in range(5)
+        ]
+        result = import_students(rows, workers=1, branch_id=north.pk)
+        self.assertEqual(result.created, 5)
+        self.assertEqual(Student.objects.filter(branch=north).count(), 5)
+
+
+class ReportPageTests(TestCase):
+
+    def test_returned_history_is_paginated(self):
+        student = Student.objects.create(
+            user=User.objects.create_user('historian'), name='Historian', registration_no='R-4', roll='4',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+        book = Book.objects.create(
+            title='Old Loans', author_name='A. Author', isbn='9780000000004',
+            book_type='Science', quantity=1, available_copies=1,
+        )
+        Issue.objects.bulk_create([
+            Issue(book=book, student=student, due_date=date.today(), is_returned=True, return_date=date.today())
+            for _ in range(60)
+        ])
+        self.client.force_login(User.objects.create_superuser('boss', password='x'))
+
+        response = self.client.get(reverse('report_generation'))
+        page = response.context['history_page']
+        self.assertEqual(page.paginator.count, 60)
+        self.assertEqual(len(page.object_list), 50)
+        self.assertContains(response, 'Returned Transactions (60 Records)')
+
+        response = self.client.get(reverse('report_generation'), {'page': 2})
+        self.assertEqual(len(response.context['history_page'].object_list), 10)
+
+
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.north = Branch.objects.create(name='North', code='north')
+        cls.book = Book.objects.create(
+            title='Archived', author_name='A. Author', isbn='9780000000006', book_type='Science', quantity=1,
+        )
+        cls.student = Student.objects.create(
+            user=User.objects.create_user('archivist'), name='Archivist', registration_no='AR-1', roll='1',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+
+    def loan(self, returned_days_ago=None, branch=None):
+        today = date.today()
+        returned = None if returned_days_ago is None else today - timedelta(days=returned_days_ago)
+        issue = Issue.objects.create(
+            branch=branch or Branch.objects.get(pk=default_branch()), book=self.book, student=self.student,
+            due_date=today - timedelta(days=40), is_returned=returned is not None, return_date=returned,
+        )
+        Issue.objects.filter(pk=issue.pk).update(issue_date=today - timedelta(days=60))
+        return issue.pk
+
+    def test_archives_loans_returned_before_the_cutoff(self):
+        old = [self.loan(45, branch=self.north), self.loan(31)]
+        kept = [self.loan(30), self.loan(5), self.loan()]
+
+        self.assertEqual(archive_returned_issues(older_than_days=30), 2)
+        self.assertEqual(sorted(Issue.objects.values_list('pk', flat=True)), sorted(kept))
+        # Same ids and branches as the loans they replace.
+        self.assertEqual(
+            sorted(IssueArchive.objects.values_list('pk', 'branch_id', 'return_date')),
+            sorted([
+                (old[0], self.north.pk, date.today() - timedelta(days=45)),
+                (old[1], default_branch(), date.today() - timedelta(days=31)),
+            ]),
+        )
+
+    def test_chunks_and_limit(self):
+        for _ in range(5):
+            self.loan(100)
+        progress = []
+        self.assertEqual(archive_returned_issues(older_than_days=30, chunk_size=2, limit=3, progress=progress.append), 3)
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(Issue.objects.count(), 2)
+        self.assertEqual(archive_returned_issues(older_than_days=30, chunk_size=2), 2)
+        self.assertEqual((Issue.objects.count(), IssueArchive.objects.count()), (0, 5))
+
+    def test_returned_history_covers_both_tables(self):
+        self.loan(100)
+        self.loan(100, branch=self.north)
+        self.loan(2)
+        self.loan()
+        archive_returned_issues(older_than_days=30)
+
+        history = list(returned_history())
+        self.assertEqual(len(history), 3)
+        self.assertEqual(
+            {(row['book_title'], row['registration_no']) for row in history}, {('Archived', 'AR-1')},
+        )
+        self.assertEqual(
+            sorted(row['return_date'] for row in history),
+            [date.today() - timedelta(days=100)] * 2 + [date.today() - timedelta(days=2)],
+        )
+        self.assertEqual(returned_history(branch=self.north).count(), 1)
+
+
+class RowEstimateTests(TestCase):
+
+    @skipUnless(connection.vendor == 'sqlite', "Checks the sqlite_stat1 lookup.")
+    def test_sqlite_estimate_for_indexed_tables(self):
+        Student.objects.bulk_create([
+            Student(user=User.objects.create_user(f'counted{i}'), name=f'Counted {i}', registration_no=f'C-{i}')
+            for i in range(12)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # Student only has indexes, so sqlite_stat1 has no idx IS NULL row for it.
+        self.assertEqual(estimate_row_count(Student), 12)
+
+
+class SearchIndexTests(SimpleTestCase):
+    """The admin searches compile to expressions these indexes cover."""
+
+    def index_sql(self, model, connection):
+        # Not entered as a context manager, so nothing runs against a database.
+        editor = connection.schema_editor(collect_sql=True)
+        return {index.name: str(index.create_sql(model, editor)) for index in model._meta.indexes}
+
+    def postgres(self):
+        # Building SQL needs no server, only the backend's compiler.
+        return PostgresWrapper(dict(connection.settings_dict, ENGINE='django.db.backends.postgresql'), alias='pg')
+
+    def test_name_index_uses_pattern_ops_on_postgresql(self):
+        sql = self.index_sql(Student, self.postgres())
+        self.assertIn('(UPPER("name") varchar_pattern_ops)', sql['student_name_prefix_idx'])
+        self.assertIn('(UPPER("registration_no"))', sql['student_regno_upper_idx'])
+
+    def test_book_search_indexes_on_postgresql(self):
+        sql = self.index_sql(Book, self.postgres())
+        self.assertIn('(UPPER("isbn"))', sql['book_isbn_upper_idx'])
+        self.assertIn('(UPPER("title") varchar_pattern_ops)', sql['book_title_prefix_idx'])
+        self.assertIn('(UPPER("author_name") varchar_pattern_ops)', sql['book_author_prefix_idx'])
+
+    @skipUnless(connection.vendor == 'sqlite', "Checks the SQLite fallback.")
+    def test_name_index_is_plain_elsewhere(self):
+        self.assertNotIn('pattern_ops', self.index_sql(Student, connection)['student_name_prefix_idx'])
+
+    def test_username_search_is_case_sensitive(self):
+        student_admin = admin.site._registry[Student]
+        request = RequestFactory().get('/')
+        queryset, _ = student_admin.get_search_results(request, Student.objects.all(), 'Reader')
+        where = str(queryset.query).split('WHERE', 1)[1]
+        self.assertIn('"auth_user"."username" = Reader', where)
+        self.assertNotIn('UPPER("auth_user"."username"', where)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', REMINDER_DAYS_BEFORE=3)
+class ReminderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        cls.book = Book.objects.create(
+            title='Reminded', author_name='A. Author', isbn='9780000000005',
+            book_type='Science', quantity=10, available_copies=3,
+        )
+        students = [
+            Student.objects.create(
+                user=User.objects.create_user(f'borrower{i}', email=f'borrower{i}@example.com' if i < 5 else ''),
+                name=f'Borrower {i}', registration_no=f'RM-{i}', roll=str(i),
+                department='CSE', season='2026', semester='1st', shift='1st',
+            )
+            for i in range(6)
+        ]
+        due = [
+            (students[0], today + timedelta(days=1)), (students[0], today + timedelta(days=2)),
+            (students[1], today + timedelta(days=3)), (students[2], today),
+            (students[3], today - timedelta(days=1)), (students[4], today - timedelta(days=5)),
+            # No email address: skipped.
+            (students[5], today + timedelta(days=1)),
+        ]
+        cls.issues = [Issue.objects.create(book=cls.book, student=s, due_date=d) for s, d in due]
+        # Returned and far-off loans get nothing.
+        Issue.objects.create(book=cls.book, student=students[1], due_date=today, is_returned=True)
+        Issue.objects.create(book=cls.book, student=students[2], due_date=today + timedelta(days=10))
+
+    def test_reminders_are_chunked_and_grouped_per_student(self):
+        calls = []
+        sent = send_reminders(chunk_size=2, progress=lambda kind, done, total: calls.append((kind, done, total)))
+        self.assertEqual(sent, {'due_soon': 3, 'overdue': 2})
+        self.assertEqual(calls, [('due_soon', 2, 3), ('due_soon', 3, 3), ('overdue', 2, 2)])
+        self.assertEqual(len(mail.outbox), 5)
+        first = next(m for m in mail.outbox if m.to == ['borrower0@example.com'])
+        self.assertEqual(first.body.count('Reminded'), 2)
+        self.assertEqual(ReminderLog.objects.count(), 6)
+
+    def test_second_run_sends_nothing(self):
+        send_reminders(chunk_size=2)
+        self.assertEqual(send_reminders(chunk_size=2), {'due_soon': 0, 'overdue': 0})
+        self.assertEqual(len(mail.outbox), 5)
+
+        # Renewing moves the due date, which makes the loan due for a new reminder.
+        renewed = self.issues[2]
+        Issue.objects.filter(pk=renewed.pk).update(due_date=date.today() + timedelta(days=2))
+        self.assertEqual(send_reminders(), {'due_soon': 1, 'overdue': 0})
+
+    def test_rerun_after_failure_only_sends_the_rest(self):
+        real_send = locmem.EmailBackend.send_messages
+        chunks = []
+
+        def flaky_send(backend, messages):
+            chunks.append(len(messages))
+            if len(chunks) == 2:
+                raise ConnectionError("SMTP went away")
+            return real_send(backend, messages)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', flaky_send):
+            with self.assertRaises(ConnectionError):
+                send_reminders(chunk_size=2)
+        self.assertEqual(len(mail.outbox), 2)
+
+        self.assertEqual(send_reminders(chunk_size=2), {'due_soon': 1, 'overdue': 2})
+        recipients = [tuple(message.to) for message in mail.outbox]
+        self.assertEqual(len(recipients), 5)
+        self.assertEqual(len(set(recipients)), 5)
+
+    def test_dry_run_counts_without_connecting(self):
+        with mock.patch.object(locmem.EmailBackend, 'open') as open_connection:
+            self.assertEqual(send_reminders(dry_run=True), {'due_soon': 3, 'overdue': 2})
+        open_connection.assert_not_called()
+        self.assertEqual((len(mail.outbox), ReminderLog.objects.count()), (0, 0))
+
+
+class DemandReportTests(TestCase):
+    """Fixed loan patterns with known answers, at target utilisation 0.8."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(
+            user=User.objects.create_user('demand'), name='Demand', registration_no='D-1', roll='1',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+
+    def make_book(self, isbn, quantity):
+        book = Book.objects.create(
+            title=f'Book {isbn}', author_name='A. Author', isbn=isbn,
+            book_type='Science', quantity=quantity, available_copies=quantity,
+        )
+        BranchStock.objects.create(branch_id=default_branch(), book=book, quantity=quantity, available_copies=quantity)
+        return book
+
+    def loan(self, book, issued, returned=None):
+        issue = Issue.objects.create(
+            book=book, student=self.student, due_date=issued + timedelta(days=14),
+            is_returned=returned is not None, return_date=returned,
+        )
+        # issue_date is auto_now_add.
+        Issue.objects.filter(pk=issue.pk).update(issue_date=issued)
+
+    def report_row(self, window_days, today):
+        report = DemandReport(window_days=window_days, today=today, target_utilization=0.8)
+        return next(report.rows())
+
+    def test_steady_load_needs_the_same_copies_for_any_window(self):
+        book = self.make_book('9780000000010', quantity=10)
+        for _ in range(4):
+            self.loan(book, date(2024, 1, 1))
+        for window_days in (30, 90, 365):
+            with self.subTest(window_days=window_days):
+                row = self.report_row(window_days, today=date(2026, 6, 15))
+                self.assertEqual(row['utilization'], 40.0)
+                self.assertEqual(row['peak_concurrent'], 4)
+                self.assertEqual(row['seasonal_factor'], 1.0)
+                self.assertEqual(row['recommended'], 5)
+
+    def test_busy_month_raises_the_recommendation(self):
+        book = self.make_book('9780000000011', quantity=2)
+        # One copy out all year, a second one out for all of March.
+        self.loan(book, date(2025, 6, 1))
+        self.loan(book, date(2026, 3, 1), returned=date(2026, 4, 1))
+        row = self.report_row(365, today=date(2026, 12, 31))
+        self.assertEqual(row['loans'], 2)
+        # (365 + 31) loan-days over 365 days and 2 copies.
+        self.assertEqual(row['utilization'], 54.2)
+        self.assertEqual(row['peak_concurrent'], 2)
+        # March averages 2 copies out against 396 / 365 for the year.
+        self.assertEqual(row['seasonal_factor'], 1.84)
+        # 2 copies at 80% utilisation.
+        self.assertEqual(row['recommended'], 3)
+
+    def test_page_is_built_by_a_background_job(self):
+        book = self.make_book('9780000000012', quantity=1)
+        self.loan(book, date.today() - timedelta(days=10))
+        self.client.force_login(User.objects.create_superuser('planner', password='x'))
+
+        response = self.client.get(reverse('demand_report'), {'days': 90})
+        self.assertIsNone(response.context['report'])
+        job = response.context['pending_job']
+        self.assertEqual((job.name, job.args['window_days']), ('demand_report', 90))
+        # Reloading while it is queued does not queue another.
+        self.client.get(reverse('demand_report'), {'days': 90})
+        self.assertEqual(Job.objects.filter(name='demand_report').count(), 1)
+
+        run_worker(burst=True)
+        response = self.client.get(reverse('demand_report'), {'days': 90})
+        self.assertIsNone(response.context['pending_job'])
+        self.assertEqual(response.context['report']['total_books'], 1)
+        self.assertContains(response, book.title)
+
+        response = self.client.get(reverse('demand_report_csv'), {'days': 90})
+        self.assertRedirects(response, reverse('job_download', args=[job.id]), fetch_redirect_response=False)
+        lines = self.client.get(response.url).content.decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'title', 'isbn'])
+        self.assertEqual(len(lines), 2)
+
+        # Recompute on request, once.
+        self.client.post(reverse('demand_report') + '?days=90')
+        self.client.post(reverse('demand_report') + '?days=90')
+        self.assertEqual(Job.objects.filter(name='demand_report', status='Queued').count(), 1)
+
+
+class RecommendationTests(TestCase):
+
+    def test_top_k_neighbours_ranks_by_cosine(self):
+        import numpy as np
+
+        # Book 10 is borrowed by students 1-3, book 20 by 1-2, book 30 by 3.
+        students = np.array([1, 2, 3, 1, 2, 3, 1])
+        books = np.array([10, 10, 10, 20, 20, 30, 20])
+        book, recommended, rank, score = top_k_neighbours(students, books, top_k=2, min_support=1, block_size=1)
+        pairs = {(b, r): (k, round(s, 4)) for b, r, k, s in zip(book.tolist(), recommended.tolist(), rank.tolist(), score.tolist())}
+        # Two shared borrowers out of 3 and 2 (the repeat loan counts once): 2 / sqrt(6).
+        self.assertEqual(pairs, {
+            (10, 20): (1, 0.8165), (10, 30): (2, 0.5774),
+            (20, 10): (1, 0.8165), (30, 10): (1, 0.5774),
+        })
+
+        book, recommended, rank, score = top_k_neighbours(students, books, top_k=1, min_support=2, metric='count')
+        self.assertEqual(list(zip(book.tolist(), recommended.tolist(), score.tolist())), [(10, 20, 2.0), (20, 10, 2.0)])
+
+    def test_lookup_skips_books_borrowed_live_or_archived(self):
+        student = Student.objects.create(
+            user=User.objects.create_user('recommended'), name='Reader', registration_no='RC-1', roll='1',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+        a, b, c, d, e, f = [
+            Book.objects.create(title=f'Book {i}', author_name='A. Author', isbn=f'978000000010{i}', book_type='Science')
+            for i in range(6)
+        ]
+        Book.objects.filter(pk=e.pk).update(is_retired=True)
+        north = Branch.objects.create(name='North', code='north')
+        for branch, book, available in [
+            (student.branch, b, 1), (student.branch, c, 1), (student.branch, d, 0), (student.branch, e, 1),
+            # Only stocked elsewhere.
+            (north, d, 2), (north, f, 2),
+        ]:
+            BranchStock.objects.create(branch=branch, book=book, quantity=2, available_copies=available)
+        today = date.today()
+        # Only archived loans.
+        for pk, book in enumerate([a, b], start=1):
+            IssueArchive.objects.create(
+                id=pk, book=book, student=student, issue_date=today, due_date=today, return_date=today,
+            )
+        BookRecommendation.objects.bulk_create([
+            BookRecommendation(book=a, recommended=b, rank=1, score=0.9),
+            BookRecommendation(book=a, recommended=c, rank=2, score=0.5),
+            BookRecommendation(book=b, recommended=e, rank=1, score=0.8),
+            BookRecommendation(book=b, recommended=d, rank=2, score=0.7),
+            BookRecommendation(book=b, recommended=c, rank=3, score=0.4),
+            BookRecommendation(book=b, recommended=f, rank=4, score=0.95),
+        ])
+        recommended = recommendations_for_student(student)
+        self.assertEqual(recommended, [d, c])
+        # Out at the student's branch, whatever the other branches hold.
+        self.assertEqual([book.branch_available for book in recommended], [0, 1])
+        self.client.force_login(student.user)
+        response = self.client.get(reverse('book_list'))
+        self.assertEqual(list(response.context['recommended_books']), [d, c])
+        self.assertContains(response, reverse('borrow_request', args=[c.pk]))
+        self.assertNotContains(response, reverse('borrow_request', args=[d.pk]))
+
+        Issue.objects.create(book=d, student=student, due_date=today)
+        self.assertEqual(recommendations_for_student(student, limit=1), [c])
+
+
+class LedgerTests(TestCase):
+
+    def test_reconcile_repairs_drifted_stock(self):
+        main = Branch.objects.get(pk=default_branch())
+        north = Branch.objects.create(name='North', code='north')
+        student = Student.objects.create(
+            user=User.objects.create_user('ledger'), name='Ledger', registration_no='L-1', roll='1',
+            department='CSE', season='2026', semester='1st', shift='1st',
+        )
+        drifted, steady = [
+            Book.objects.create(title=f'Book {i}', author_name='A. Author', isbn=f'978000000020{i}', book_type='Science')
+            for i in range(2)
+        ]
+        stock = {
+            # 1 open loan but all 3 copies shown as available: expect 2.
+            'main': BranchStock.objects.create(branch=main, book=drifted, quantity=3, available_copies=3),
+            # Issued out twice with one copy: expect 0, not -1.
+            'north': BranchStock.objects.create(branch=north, book=drifted, quantity=1, available_copies=1),
+            'steady': BranchStock.objects.create(branch=main, book=steady, quantity=2, available_copies=1),
+        }
+        today = date.today()
+        for branch, book in [(main, drifted), (north, drifted), (north, drifted), (main, steady)]:
+            Issue.objects.create(branch=branch, book=book, student=student, due_date=today)
+        refresh_book_totals()
+
+        self.assertEqual(sorted(row[0] for row in find_drift()), sorted([stock['main'].pk, stock['north'].pk]))
+        out = io.StringIO()
+        call_command('reconcile_inventory', '--repair', stdout=out)
+        self.assertIn('Repaired 2 stock rows.', out.getvalue())
+
+        for row in stock.values():
+            row.refresh_from_db()
+        self.assertEqual(
+            [stock['main'].available_copies, stock['north'].available_copies, stock['steady'].available_copies], [2, 0, 1],
+        )
+        drifted.refresh_from_db()
+        self.assertEqual((drifted.quantity, drifted.available_copies), (4, 2))
+        self.assertEqual(
+            sorted(CirculationEvent.objects.filter(kind='reconcile').values_list('book_id', 'delta', 'note')),
+            [
+                (drifted.pk, -1, f"branch #{main.pk}: available 3 -> 2 (1 open loans)"),
+                (drifted.pk, -1, f"branch #{north.pk}: available 1 -> 0 (2 open loans)"),
+            ],
+        )
+        self.assertEqual(find_drift(), [])
+
+    def test_writer_flushes_in_batches(self):
+        book = Book.objects.create(title='Logged', author_name='A. Author', isbn='9780000000210', book_type='Science')
+        with LedgerWriter(batch_size=2) as ledger:
+            for _ in range(3):
+                ledger.add('issue', book, delta=-1)
+            self.assertEqual(CirculationEvent.objects.count(), 2)
+        self.assertEqual(CirculationEvent.objects.filter(book_id=book.pk, delta=-1).count(), 3)
+
+
+@override_settings(EVENTS_CACHE_ALIAS='default', EVENTS_POLL_INTERVAL=0.01, EVENTS_RETRY_MS=3000)
+class EventStreamTests(TransactionTestCase):
+    """publish() only stores events on commit, so these run against real transactions."""
+
+    def setUp(self):
+        cache.clear()
+
+    async def read(self, stream):
+        return await asyncio.wait_for(anext(stream), timeout=5)
+
+    async def close(self, stream):
+        await stream.aclose()
+        task = events.get_relay().task
+        if task is not None:
+            task.cancel()
+
+    def publish_committed(self, count):
+        for i in range(count):
+            with transaction.atomic():
+                events.publish('counters', issued_books_count=i)
+
+    async def test_published_event_reaches_an_open_stream(self):
+        stream = events.event_stream()
+        self.assertEqual(await self.read(stream), 'retry: 3000\n\n')
+        next_chunk = asyncio.ensure_future(self.read(stream))
+
+        def publish():
+            with transaction.atomic():
+                events.publish('request', id=7, status='Pending')
+                # Nothing leaves before the commit.
+                self.assertIsNone(cache.get(events.event_key(1)))
+
+        await sync_to_async(publish)()
+        self.assertEqual(
+            await next_chunk, 'id: 1\nevent: request\ndata: {"id": 7, "status": "Pending"}\n\n',
+        )
+        await self.close(stream)
+
+    async def test_reconnect_replays_missed_events(self):
+        await sync_to_async(self.publish_committed)(3)
+        stream = events.event_stream(last_event_id=1, snapshot=lambda: self.fail("Replay needs no snapshot."))
+        await self.read(stream)
+        self.assertEqual(await self.read(stream), 'id: 2\nevent: counters\ndata: {"issued_books_count": 1}\n\n')
+        self.assertEqual(await self.read(stream), 'id: 3\nevent: counters\ndata: {"issued_books_count": 2}\n\n')
+        await self.close(stream)
+
+    async def test_reconnect_falls_back_to_a_snapshot_when_events_expired(self):
+        await sync_to_async(self.publish_committed)(3)
+        cache.delete(events.event_key(2))
+        stream = events.event_stream(last_event_id=1, snapshot=lambda: {'counters': {'issued_books_count': 5}})
+        await self.read(stream)
+        self.assertEqual(
+            await self.read(stream), 'id: 3\nevent: snapshot\ndata: {"counters": {"issued_books_count": 5}}\n\n',
+        )
+        await self.close(stream)
+
+
+class EventsCacheCheckTests(SimpleTestCase):
+
+    @override_settings(EVENTS_CACHE_ALIAS='default', CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_warns_about_a_per_process_cache_with_several_workers(self):
+        self.assertEqual([warning.id for warning in events_cache_warnings(2)], ['library.W001'])
+        self.assertEqual(events_cache_warnings(1), [])
+
+    @override_settings(EVENTS_CACHE_ALIAS='default', CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'},
+    })
+    def test_shared_cache_is_fine(self):
+        self.assertEqual(events_cache_warnings(4), [])
 
-# Create your tests here.
@@ -0,0 +1,233 @@
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """``'10/min'`` -> ``(10, 10 / 60)``: bucket capacity and tokens refilled per second."""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    number = ''.join(ch for ch in period if ch.isdigit()) or '1'
+    unit = period.lstrip('0123456789').strip().lower()
+    if unit not in PERIODS:
+        raise ValueError(f"Unknown throttle period in {rate!r}.")
+    return count, count / (int(number) * PERIODS[unit])
+
+
+def refill(tokens, updated, capacity, per_second, now):
+    """Top a bucket up for the time since ``updated`` and try to take one token."""
+    tokens = min(capacity, tokens + (now - updated) * per_second)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, math.ceil((1 - tokens) / per_second)
+
+
+class LocalStore:
+    """
+    Buckets in a dict guarded by a lock. Each worker process keeps its own,
+    so the effective limit is per process; fine for a single web dyno.
+    """
+
+    def __init__(self, max_buckets=100_000):
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.buckets = {}
+        self.counters = {}
+
+    def consume(self, key, capacity, per_second, now):
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens, retry_after = refill(tokens, updated, capacity, per_second, now)
+            if len(self.buckets) >= self.max_buckets and key not in self.buckets:
+                self._prune(now)
+            self.buckets[key] = (tokens, now)
+            return retry_after
+
+    def _prune(self, now):
+        # Buckets idle long enough to be full again carry no state.
+        self.buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self.buckets.items()
+            if now - updated < 3600
+        }
+
+    def incr(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, buckets=len(self.buckets))
+
+
+class CacheStore:
+    """
+    Buckets in a Django cache shared by every worker (Redis, Memcached,
+    database). Reads and writes are not one atomic step, so a burst racing
+    across workers can get a few extra requests through; the limit holds
+    within a token or two per worker.
+    """
+
+    def __init__(self, alias='default', prefix='throttle'):
+        self.alias = alias
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def reset(self):
+        self.cache.delete_many([self._counter(name) for name in self.counter_names()])
+
+    def consume(self, key, capacity, per_second, now):
+        cache_key = f'{self.prefix}:{key}'
+        tokens, updated = self.cache.get(cache_key) or (capacity, now)
+        tokens, retry_after = refill(tokens, updated, capacity, per_second, now)
+        # Once the bucket would be full again the entry carries no state.
+        self.cache.set(cache_key, (tokens, now), timeout=math.ceil(capacity / per_second) + 1)
+        return retry_after
+
+    def _counter(self, name):
+        return f'{self.prefix}:count:{name}'
+
+    def incr(self, name):
+        key = self._counter(name)
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, timeout=None)
+
+    def counter_names(self):
+        names = []
+        for url_name, config in settings.THROTTLE_RATES.items():
+            for scope in ('ip', 'user'):
+                if scope in config:
+                    names += [f'{url_name}.{scope}.allowed', f'{url_name}.{scope}.throttled']
+        return names
+
+    def stats(self):
+        values = self.cache.get_many([self._counter(name) for name in self.counter_names()])
+        return {name: values.get(self._counter(name), 0) for name in self.counter_names()}
+
+
+_stores = {}
+
+
+def get_store():
+    name = settings.THROTTLE_STORE
+    if name not in _stores:
+        _stores[name] = LocalStore() if name == 'local' else CacheStore(settings.THROTTLE_CACHE_ALIAS)
+    return _stores[name]
+
+
+def reset():
+    """Forget every bucket and counter (used by tests)."""
+    get_store().reset()
+
+
+def client_ip(request):
+    """
+    REMOTE_ADDR, or the address the last trusted proxy saw when
+    THROTTLE_PROXY_COUNT proxies (e.g. the Heroku router) sit in front.
+    """
+    proxies = settings.THROTTLE_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def user_key(request, url_name):
+    """
+    Who the request is for, without touching the ORM: the username being
+    tried on the login form, otherwise the user id stored in the session.
+    """
+    if url_name == 'login':
+        return request.POST.get('username', '').strip().lower() or None
+    return request.session.get(SESSION_KEY)
+
+
+def throttled(retry_after):
+    response = HttpResponse("Too many requests. Please slow down.\n", status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class ThrottleMiddleware:
+    """
+    Token buckets per client IP and per user for the URL names listed in
+    THROTTLE_RATES. Runs in ``process_view``, so a throttled request is
+    answered before the view (and its password hashing or queries) runs.
+    The IP bucket is checked first and needs no database at all.
+
+    Works natively under both WSGI and ASGI: under ASGI requests for
+    unthrottled URLs (the event stream included) pass through without a
+    hop to a thread, and only the bucket check itself runs in one.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The handler adapts process_view by its own kind, so offer a coroutine.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def rates_for(self, request):
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        config = settings.THROTTLE_RATES.get(url_name)
+        if not config or request.method not in config.get('methods', ('GET', 'POST')):
+            return None, None
+        return url_name, config
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name, config = self.rates_for(request)
+        return self.check(request, url_name, config) if config else None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        url_name, config = self.rates_for(request)
+        if not config:
+            return None
+        # The stores and the session are synchronous.
+        return await sync_to_async(self.check)(request, url_name, config)
+
+    def check(self, request, url_name, config):
+        store = get_store()
+        now = time.time()
+        for scope in ('ip', 'user'):
+            if scope not in config:
+                continue
+            who = client_ip(request) if scope == 'ip' else user_key(request, url_name)
+            if who is None:
+                continue
+            capacity, per_second = parse_rate(config[scope])
+            retry_after = store.consume(f'{url_name}:{scope}:{who}', capacity, per_second, now)
+            if retry_after:
+                store.incr(f'{url_name}.{scope}.throttled')
+                return throttled(retry_after)
+            store.incr(f'{url_name}.{scope}.allowed')
+        return None
@@ -7,6 +7,8 @@ urlpatterns = [
     path('login/', views.login_request, name='login'),
     path('logout/', views.logout_request, name='logout'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/events/', views.dashboard_events, name='dashboard_events'),
+    path('branch/', views.switch_branch, name='switch_branch'),
     
     path('books/', views.book_list, name='book_list'),
     path('books/add/', views.add_book, name='add_book'),
@@ -14,6 +16,7 @@ urlpatterns = [
     path('return/', views.return_book, name='return_book'),
     
     path('students/', views.manage_students_view, name='manage_students'),
+    path('students/import/', views.import_students_view, name='import_students'),
     
     path('requests/', views.admin_borrow_requests, name='admin_requests'),
     path('requests/approve/<int:request_id>/', views.approve_borrow_request, name='approve_request'),
@@ -23,6 +26,14 @@ urlpatterns = [
     path('return/confirm/<int:issue_id>/', views.student_return_request, name='student_return_request'),
     
     path('reports/', views.report_generation_view, name='report_generation'),
+    path('reports/export/', views.report_export, name='report_export'),
+    path('reports/demand/', views.demand_report_view, name='demand_report'),
+    path('reports/demand.csv', views.demand_report_csv, name='demand_report_csv'),
+
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    path('throttle/stats/', views.throttle_stats, name='throttle_stats'),
     
     
     path('renew/', views.renew_book, name='renew_book'), 
@@ -1,9 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from datetime import date, timedelta
-from django.db.models import Sum
+import io
+from django.core.paginator import Paginator
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 
 from .forms import (
     UserRegistrationForm,
@@ -11,9 +19,24 @@ from .forms import (
     BookForm,
     IssueBookForm,
     ReturnBookForm,
-    RenewBookForm
+    RenewBookForm,
+    StudentImportForm
 )
-from .models import Book, Student, Issue, BorrowRequest
+from .models import Book, Branch, BranchStock, Student, Issue, BorrowRequest, Job
+from .analytics import MONTHS
+from .archive import returned_history
+from .branches import (
+    ALL_BRANCHES, SESSION_KEY as BRANCH_SESSION_KEY, branch_filter, current_branch, get_stock, move_stock,
+    set_branch_quantity, working_branch
+)
+from .events import event_stream, publish
+from .onboarding import CSV_COLUMNS, import_students, read_csv
+from .jobs import enqueue
+from .ledger import record_event
+from .recommendations import recommendations_for_student
+from .retirement import retire_book
+from .throttling import get_store
+from django.conf import settings
 from django.contrib.auth.models import User
 
 
@@ -24,6 +47,37 @@ def is_student(user):
     return Student.objects.filter(user=user).exists() and not user.is_staff
 
 
+def admin_counters(branch=None):
+    """Dashboard totals for ``branch`` (a Branch or its id), or the whole network when ``None``."""
+    if branch is None:
+        total_books = Book.objects.aggregate(Sum('quantity'))['quantity__sum']
+    else:
+        total_books = BranchStock.objects.for_branch(branch).filter(book__is_retired=False).aggregate(Sum('quantity'))['quantity__sum']
+    return {
+        'total_books': total_books or 0,
+        'total_students': Student.objects.filter(**branch_filter(branch)).count(),
+        'issued_books_count': Issue.objects.for_branch(branch).filter(is_returned=False).count(),
+        'pending_requests_count': BorrowRequest.objects.for_branch(branch).filter(status='Pending').count(),
+        'overdue_books': Issue.objects.for_branch(branch).filter(is_returned=False, due_date__lt=date.today()).count(),
+    }
+
+
+def request_row(req):
+    """A borrow request as sent to open request-manager pages."""
+    return {
+        'id': req.id,
+        'branch': req.branch_id,
+        'status': req.status,
+        'student_name': req.student.name,
+        'registration_no': req.student.registration_no,
+        'book_title': req.book.title,
+        'isbn': req.book.isbn,
+        'request_date': req.request_date.strftime('%b %d, %Y'),
+        'approve_url': reverse('approve_request', args=[req.id]),
+        'reject_url': reverse('reject_request', args=[req.id]),
+    }
+
+
 def register_request(request):
     if request.method == "POST":
         user_form = UserRegistrationForm(request.POST)
@@ -87,11 +141,7 @@ def dashboard_view(request):
     
     if is_admin(request.user):
         context['is_admin'] = True
-        context['total_books'] = Book.objects.aggregate(Sum('quantity'))['quantity__sum'] or 0
-        context['total_students'] = Student.objects.count()
-        context['issued_books_count'] = Issue.objects.filter(is_returned=False).count()
-        context['pending_requests_count'] = BorrowRequest.objects.filter(status='Pending').count()
-        context['overdue_books'] = Issue.objects.filter(is_returned=False, due_date__lt=date.today()).count()
+        context.update(admin_counters(current_branch(request)))
         
     elif is_student(request.user):
         context['is_student'] = True
@@ -118,6 +168,7 @@ def dashboard_view(request):
             
             context['pending_requests'] = BorrowRequest.objects.filter(student=student, status='Pending').count()
             context['approved_requests'] = BorrowRequest.objects.filter(student=student, status='Approved').count()
+            context['recommended_books'] = recommendations_for_student(student)
             
         except Student.DoesNotExist:
             context['student'] = None
@@ -127,22 +178,27 @@ def dashboard_view(request):
 
 @login_required
 def book_list(request):
-    books = Book.objects.all().order_by('title')
+    branch = current_branch(request)
+    books = Book.objects.for_branch(branch).order_by('title')
     
     
     pending_books = []
+    recommended_books = []
     if is_student(request.user):
         try:
             student = Student.objects.get(user=request.user)
             
             pending_requests = BorrowRequest.objects.filter(student=student, status__in=['Pending', 'Approved']) 
             pending_books = [req.book.id for req in pending_requests]
+            recommended_books = recommendations_for_student(student)
         except Student.DoesNotExist:
             pass
 
     context = {
         'books': books,
+        'branch': branch,
         'pending_books': pending_books, 
+        'recommended_books': recommended_books,
     }
     return render(request, 'library/book_list.html', context)
 
@@ -156,6 +212,9 @@ def add_book(request):
             book = form.save(commit=False)
 
             book.save() 
+            branch = working_branch(request)
+            BranchStock.objects.create(branch=branch, book=book, quantity=book.quantity, available_copies=book.quantity)
+            record_event('stock', book, delta=book.quantity, note=f"Book added at {branch.name}")
             messages.success(request, f"Book '{book.title}' added successfully.")
             return redirect('add_book')
     else:
@@ -167,15 +226,27 @@ def add_book(request):
 @user_passes_test(is_admin, login_url='/dashboard/')
 def edit_book(request, book_id):
     book = get_object_or_404(Book, id=book_id)
+    branch = working_branch(request)
+    stock = get_stock(book, branch)
+    old_quantity = stock.quantity if stock else 0
+    # The quantity on the form is the copies this branch owns.
+    initial = {'quantity': old_quantity}
     if request.method == 'POST':
-        form = BookForm(request.POST, instance=book)
+        network_quantity = book.quantity
+        form = BookForm(request.POST, instance=book, initial=initial)
         if form.is_valid():
-            form.save()
+            book = form.save(commit=False)
+            quantity, book.quantity = book.quantity, network_quantity
+            book.save()
+            if quantity != old_quantity:
+                delta = set_branch_quantity(book, branch, quantity)
+                record_event('stock', book, delta=delta,
+                             note=f"Quantity at {branch.name} {old_quantity} -> {quantity}")
             messages.success(request, f"Book '{book.title}' updated successfully.")
             return redirect('book_list')
     else:
-        form = BookForm(instance=book)
-    return render(request, 'library/book_form.html', {'form': form, 'form_title': f'Edit Book: {book.title}'})
+        form = BookForm(instance=book, initial=initial)
+    return render(request, 'library/book_form.html', {'form': form, 'form_title': f'Edit Book: {book.title} ({branch.name})'})
 
 
 @login_required
@@ -188,8 +259,11 @@ def delete_book(request, book_id):
             messages.error(request, f"Cannot delete book '{book.title}'. There are still copies issued out.")
             return redirect('book_list')
             
-        book.delete()
-        messages.success(request, f"Book '{book.title}' and all its records have been successfully deleted.")
+        retire_book(book)
+        enqueue('purge_book', owner=request.user, book_id=book.id)
+        # Retiring hides the book but leaves its stock as it is.
+        record_event('stock', book, note="Book retired")
+        messages.success(request, f"Book '{book.title}' has been removed from the catalogue. Its records are being deleted in the background.")
         return redirect('book_list')
         
     context = {
@@ -221,16 +295,19 @@ def issue_book(request):
                 messages.error(request, f"Book with ISBN {isbn} not found.")
                 return redirect('issue_book')
             
-            if book.available_copies <= 0:
-                messages.error(request, f"Book '{book.title}' is currently out of stock.")
+            branch = working_branch(request)
+            stock = get_stock(book, branch)
+            if stock is None or stock.available_copies <= 0:
+                messages.error(request, f"Book '{book.title}' is currently out of stock at {branch.name}.")
                 return redirect('issue_book')
 
             
-            Issue.objects.create(book=book, student=student, due_date=due_date)
+            issue = Issue.objects.create(branch=branch, book=book, student=student, due_date=due_date)
             
             
-            book.available_copies -= 1
-            book.save()
+            move_stock(book, branch, -1)
+            record_event('issue', book, delta=-1, student=student, issue=issue)
+            publish('circulation', branch=branch.id, counters={'issued_books_count': 1})
             
             messages.success(request, f"Book '{book.title}' issued to {student.name} successfully.")
             return redirect('issue_book')
@@ -243,8 +320,9 @@ def issue_book(request):
 @login_required
 @user_passes_test(is_admin, login_url='/dashboard/')
 def return_book(request):
+    branch = current_branch(request)
     if request.method == 'POST':
-        form = ReturnBookForm(request.POST)
+        form = ReturnBookForm(request.POST, branch=branch)
         if form.is_valid():
 
             issue = form.cleaned_data['issue_record']
@@ -257,8 +335,8 @@ def return_book(request):
             issue.save()
 
             book = issue.book
-            book.available_copies += 1
-            book.save()
+            move_stock(book, issue.branch_id, 1)
+            record_event('return', book, delta=1, student=issue.student, issue=issue)
 
             borrow_req = BorrowRequest.objects.filter(
                 student=issue.student,
@@ -270,6 +348,12 @@ def return_book(request):
                 borrow_req.status = 'Completed'
                 borrow_req.save()
 
+            counters = {'issued_books_count': -1}
+            if issue.due_date < issue.return_date:
+                counters['overdue_books'] = -1
+            publish('circulation', branch=issue.branch_id, counters=counters,
+                    request=request_row(borrow_req) if borrow_req else None)
+
             fine_message = f" (Fine: {fine} Taka)." if fine > 0 else "."
             messages.success(request, f"Book '{book.title}' returned successfully by {issue.student.name}{fine_message}")
             
@@ -277,7 +361,7 @@ def return_book(request):
             
     else:
 
-        form = ReturnBookForm()
+        form = ReturnBookForm(branch=branch)
         
     context = {
         'form': form,
@@ -287,23 +371,122 @@ def return_book(request):
     return render(request, 'library/return_book_form.html', context)
 
 
+STUDENT_SORTS = {
+    'name': 'name',
+    'registration_no': 'registration_no',
+    'department': 'department',
+    'semester': 'semester',
+    'open_loans': 'open_loans',
+    'overdue_loans': 'overdue_loans',
+    'fine': 'overdue_time',
+}
+
+
+def open_loan_stats(today):
+    """Per-student open loan, overdue and overdue-time subqueries for Student.annotate()."""
+    open_issues = Issue.objects.filter(student=OuterRef('pk'), is_returned=False).order_by().values('student')
+    overdue = open_issues.filter(due_date__lt=today)
+    overdue_time = ExpressionWrapper(Value(today, output_field=DateField()) - F('due_date'), output_field=DurationField())
+    return {
+        'open_loans': Coalesce(Subquery(open_issues.annotate(n=Count('pk')).values('n')), 0),
+        'overdue_loans': Coalesce(Subquery(overdue.annotate(n=Count('pk')).values('n')), 0),
+        'overdue_time': Subquery(overdue.annotate(total=Sum(overdue_time)).values('total'), output_field=DurationField()),
+    }
+
+
 @login_required
 @user_passes_test(is_admin, login_url='/dashboard/')
 def manage_students_view(request):
-    students = Student.objects.select_related('user').all().order_by('name')
-    
+    today = date.today()
+    query = request.GET.get('q', '').strip()
+    department = request.GET.get('department', '')
+    semester = request.GET.get('semester', '')
+    sort = request.GET.get('sort', 'name')
+    if sort.lstrip('-') not in STUDENT_SORTS:
+        sort = 'name'
+    descending = sort.startswith('-')
+
+    students = Student.objects.filter(**branch_filter(current_branch(request))).select_related('user')
+    if query:
+        students = students.filter(Q(registration_no__iexact=query) | Q(name__istartswith=query))
+    if department:
+        students = students.filter(department=department)
+    if semester:
+        students = students.filter(semester=semester)
+
+    order = STUDENT_SORTS[sort.lstrip('-')]
+    students = students.annotate(**open_loan_stats(today)).order_by(
+        F(order).desc(nulls_last=True) if descending else F(order).asc(nulls_first=True), 'pk',
+    )
+
+    page = Paginator(students, 25).get_page(request.GET.get('page'))
+    for student in page:
+        overdue_days = student.overdue_time.days if student.overdue_time else 0
+        student.accrued_fine = overdue_days * Issue.FINE_PER_DAY
+
+    filters = request.GET.copy()
+    filters.pop('page', None)
+    sort_filters = filters.copy()
+    sort_filters.pop('sort', None)
+
     context = {
-        'students': students,
+        'students': page,
+        'page_obj': page,
+        'query': query,
+        'department': department,
+        'semester': semester,
+        'sort': sort,
+        'departments': Student.objects.order_by('department').values_list('department', flat=True).distinct(),
+        'semesters': Student.objects.order_by('semester').values_list('semester', flat=True).distinct(),
+        'filter_query': filters.urlencode(),
+        'sort_query': sort_filters.urlencode(),
         'title': 'Manage Student Accounts'
     }
 
     return render(request, 'library/manage_students.html', context)
 
 
+@login_required
+@user_passes_test(is_admin, login_url='/dashboard/')
+def import_students_view(request):
+    result = None
+    if request.method == 'POST':
+        form = StudentImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['csv_file']
+            if form.cleaned_data['dry_run']:
+                csv_file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+                result = import_students(read_csv(csv_file), dry_run=True)
+                messages.info(request, f"{result.valid} valid rows, {len(result.errors)} rows with errors. Nothing was created.")
+            else:
+                job = enqueue(
+                    'import_students', owner=request.user, payload=upload.read(),
+                    branch_id=working_branch(request).pk,
+                )
+                messages.success(request, "Import queued. This page updates when it finishes.")
+                return redirect('job_detail', job_id=job.id)
+    else:
+        form = StudentImportForm()
+
+    context = {
+        'form': form,
+        'result': result,
+        'csv_columns': CSV_COLUMNS,
+        'import_branch': working_branch(request),
+        'title': 'Bulk Student Import',
+    }
+    return render(request, 'library/student_import.html', context)
+
+
 @login_required
 @user_passes_test(is_admin, login_url='/dashboard/')
 def admin_borrow_requests(request):
-    requests = BorrowRequest.objects.filter(status__in=['Pending', 'Approved']).order_by('request_date')
+    requests = (
+        BorrowRequest.objects.for_branch(current_branch(request))
+        .filter(status__in=['Pending', 'Approved'])
+        .select_related('book', 'student')
+        .order_by('request_date')
+    )
     
     context = {
         'requests': requests,
@@ -322,29 +505,35 @@ def approve_borrow_request(request, request_id):
         return redirect('admin_requests')
 
     book = req.book
+    stock = get_stock(book, req.branch_id)
     
-    if book.available_copies <= 0:
-        messages.error(request, f"Cannot approve. Book '{book.title}' is out of stock.")
+    if stock is None or stock.available_copies <= 0:
+        messages.error(request, f"Cannot approve. Book '{book.title}' is out of stock at {req.branch.name}.")
         req.status = 'Rejected'
+        req.out_of_stock = True
         req.save()
+        publish('circulation', branch=req.branch_id, counters={'pending_requests_count': -1}, request=request_row(req))
         return redirect('admin_requests')
 
     
     due_date = date.today() + timedelta(days=7)
     
-    Issue.objects.create(
+    issue = Issue.objects.create(
+        branch_id=req.branch_id,
         book=book,
         student=req.student,
         due_date=due_date
     )
     
     
-    book.available_copies -= 1
-    book.save()
+    move_stock(book, req.branch_id, -1)
+    record_event('issue', book, delta=-1, student=req.student, issue=issue, note=f"Borrow request #{req.id}")
     
     
     req.status = 'Approved'
     req.save()
+    publish('circulation', branch=req.branch_id, counters={'pending_requests_count': -1, 'issued_books_count': 1},
+            request=request_row(req))
     
     messages.success(request, f"Book '{book.title}' issued and request approved for {req.student.name}. Due: {due_date}")
     return redirect('admin_requests')
@@ -362,6 +551,7 @@ def reject_borrow_request(request, request_id):
         
     req.status = 'Rejected'
     req.save()
+    publish('circulation', branch=req.branch_id, counters={'pending_requests_count': -1}, request=request_row(req))
     messages.info(request, f"Borrow request for {req.book.title} from {req.student.name} rejected.")
     return redirect('admin_requests')
 
@@ -395,12 +585,16 @@ def borrow_request(request, book_id):
         return redirect('book_list')
         
     
-    if book.available_copies <= 0:
-        messages.error(request, f"Sorry, '{book.title}' is currently out of stock.")
+    stock = get_stock(book, student.branch_id)
+    if stock is None or stock.available_copies <= 0:
+        # The network total is precomputed on Book, so this costs no extra query.
+        elsewhere = " It is available at another branch." if book.available_copies > 0 else ""
+        messages.error(request, f"Sorry, '{book.title}' is currently out of stock at your branch.{elsewhere}")
         return redirect('book_list')
 
     
-    BorrowRequest.objects.create(student=student, book=book, status='Pending')
+    req = BorrowRequest.objects.create(branch_id=student.branch_id, student=student, book=book, status='Pending')
+    publish('circulation', branch=req.branch_id, counters={'pending_requests_count': 1}, request=request_row(req))
     
     messages.success(request, f"Request for '{book.title}' submitted successfully. The librarian will review shortly.")
     return redirect('book_list')
@@ -409,10 +603,13 @@ def borrow_request(request, book_id):
 @login_required
 @user_passes_test(is_admin, login_url='/dashboard/')
 def report_generation_view(request):
+    branch = current_branch(request)
     
-    current_issues = Issue.objects.filter(is_returned=False).select_related('book', 'student').order_by('due_date')
+    current_issues = Issue.objects.for_branch(branch).filter(is_returned=False).select_related('book', 'student').order_by('due_date')
 
-    returned_transactions = Issue.objects.filter(is_returned=True).select_related('book', 'student').order_by('-issue_date')
+    # The full history is for the CSV export job; the page shows it 50 rows at a time.
+    returned_transactions = returned_history(**branch_filter(branch)).order_by('-issue_date', '-return_date')
+    history_page = Paginator(returned_transactions, 50).get_page(request.GET.get('page'))
 
     overdue_books = current_issues.filter(due_date__lt=date.today())
     
@@ -425,9 +622,10 @@ def report_generation_view(request):
 
     context = {
         'title': 'Generate Library Reports',
+        'branch': branch,
         
         'current_issues': current_issues,
-        'returned_transactions': returned_transactions,
+        'history_page': history_page,
         'overdue_books': overdue_books,
         
         'total_books_issued': total_books_issued,
@@ -438,6 +636,120 @@ def report_generation_view(request):
     return render(request, 'library/report_generation.html', context)
 
 
+def get_demand_window(request):
+    try:
+        return min(max(int(request.GET.get('days', 365)), 30), 3650)
+    except ValueError:
+        return 365
+
+
+def demand_report_jobs(request, window_days, refresh=False):
+    """
+    The demand report is too heavy to build inside a request, so it runs
+    as a ``demand_report`` job per window and branch. Returns the latest
+    succeeded job (or None) and the job now queued or running (or None),
+    queuing one when there is no result younger than DEMAND_REPORT_MAX_AGE,
+    or on ``refresh``. A recent failure is not retried until asked to.
+    """
+    branch = current_branch(request)
+    branch_id = branch.id if branch else None
+    jobs = Job.objects.defer('payload', 'output').filter(
+        name='demand_report', args__window_days=window_days, args__branch_id=branch_id,
+    )
+    report_job = jobs.filter(status='Succeeded').order_by('-finished_at').first()
+    pending_job = jobs.filter(status__in=['Queued', 'Running']).order_by('-id').first()
+    if pending_job is None:
+        cutoff = timezone.now() - timedelta(seconds=settings.DEMAND_REPORT_MAX_AGE)
+        fresh = report_job is not None and report_job.finished_at >= cutoff
+        failed = jobs.filter(status='Failed', finished_at__gte=cutoff).exists()
+        if refresh or not (fresh or failed):
+            pending_job = enqueue('demand_report', owner=request.user, window_days=window_days, branch_id=branch_id)
+    return report_job, pending_job
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/dashboard/')
+def demand_report_view(request):
+    window_days = get_demand_window(request)
+    report_job, pending_job = demand_report_jobs(request, window_days, refresh=request.method == 'POST')
+    if request.method == 'POST':
+        return redirect(f"{reverse('demand_report')}?days={window_days}")
+
+    context = {
+        'title': 'Demand & Stock Recommendations',
+        'branch': current_branch(request),
+        'window_days': window_days,
+        'report_job': report_job,
+        'pending_job': pending_job,
+        'report': report_job.result['report'] if report_job else None,
+        'months': MONTHS,
+    }
+    return render(request, 'library/demand_report.html', context)
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/dashboard/')
+def demand_report_csv(request):
+    report_job, pending_job = demand_report_jobs(request, get_demand_window(request))
+    if report_job is not None:
+        return redirect('job_download', job_id=report_job.id)
+    if pending_job is not None:
+        messages.info(request, "The demand report is being prepared. The download link appears here when it is ready.")
+        return redirect('job_detail', job_id=pending_job.id)
+    return redirect('demand_report')
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/dashboard/')
+def report_export(request):
+    if request.method != 'POST':
+        return redirect('report_generation')
+    branch = current_branch(request)
+    job = enqueue('circulation_report', owner=request.user, branch_id=branch.id if branch else None)
+    messages.success(request, "Report export queued. The download link appears here when it is ready.")
+    return redirect('job_detail', job_id=job.id)
+
+
+def get_job_for_user(request, job_id):
+    job = get_object_or_404(Job.objects.defer('payload', 'output'), id=job_id)
+    if job.owner_id != request.user.id and not is_admin(request.user):
+        raise Http404("Job not found.")
+    return job
+
+
+@login_required
+def job_detail(request, job_id):
+    job = get_job_for_user(request, job_id)
+    return render(request, 'library/job_detail.html', {'job': job, 'title': f'Background Job #{job.id}'})
+
+
+@login_required
+def job_status(request, job_id):
+    job = get_job_for_user(request, job_id)
+    return JsonResponse({
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'progress_message': job.progress_message,
+        'attempts': job.attempts,
+        'finished': job.is_finished,
+        'result': job.result,
+    })
+
+
+@login_required
+def job_download(request, job_id):
+    job = get_job_for_user(request, job_id)
+    filename = (job.result or {}).get('file')
+    output = Job.objects.filter(pk=job.pk).values_list('output', flat=True).first()
+    if job.status != 'Succeeded' or not filename or output is None:
+        raise Http404("No file for this job.")
+    response = HttpResponse(bytes(output), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 @user_passes_test(is_student, login_url='/login/')
 def student_return_request(request, issue_id):
@@ -474,8 +786,9 @@ def home_view(request):
 @user_passes_test(is_admin, login_url='/dashboard/')
 def renew_book(request):
     
+    branch = current_branch(request)
     if request.method == 'POST':
-        form = RenewBookForm(request.POST)
+        form = RenewBookForm(request.POST, branch=branch)
         if form.is_valid():
             issue = form.cleaned_data['issue_record']
             renewal_days = form.cleaned_data['renewal_days']
@@ -494,11 +807,12 @@ def renew_book(request):
             
             issue.due_date = new_due_date
             issue.save()
+            record_event('renew', issue.book, student=issue.student, issue=issue, note=f"Due date -> {new_due_date}")
             
             messages.success(request, f"Book '{issue.book.title}' successfully renewed for {issue.student.name} by {renewal_days} days. New Due Date: {new_due_date}.")
             return redirect('renew_book')
     else:
-        form = RenewBookForm()
+        form = RenewBookForm(branch=branch)
         
     context = {
         'form': form,
@@ -506,3 +820,53 @@ def renew_book(request):
         'submit_button_text': 'Renew Book'
     }
     return render(request, 'library/issue_book_form.html', context)
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/dashboard/')
+def throttle_stats(request):
+    """Allowed/throttled counters per protected URL and bucket scope, for monitoring."""
+    return JsonResponse({'store': settings.THROTTLE_STORE, 'counters': get_store().stats()})
+
+
+@login_required
+@user_passes_test(is_admin, login_url='/dashboard/')
+async def dashboard_events(request):
+    """
+    Server-sent events with counter deltas and borrow request changes for
+    the admin dashboard and request manager. Needs the ASGI entry point;
+    under WSGI a stream would tie up a worker, so browsers get 204 and stop
+    reconnecting (the pages still work with manual reloads).
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    # The page's branch id; events for other branches are ignored by the page.
+    branch = request.GET.get('branch')
+    branch = int(branch) if branch and branch.isdigit() else None
+    response = StreamingHttpResponse(
+        event_stream(last_event_id, snapshot=lambda: {'counters': admin_counters(branch)}),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@user_passes_test(lambda user: user.is_staff, login_url='/dashboard/')
+def switch_branch(request):
+    """Choose the branch staff pages are scoped to (or every branch)."""
+    if request.method == 'POST':
+        choice = request.POST.get('branch', '')
+        if choice == ALL_BRANCHES:
+            request.session[BRANCH_SESSION_KEY] = ALL_BRANCHES
+        elif Branch.objects.filter(pk=choice if choice.isdigit() else None).exists():
+            request.session[BRANCH_SESSION_KEY] = int(choice)
+    next_url = request.POST.get('next') or request.GET.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = 'dashboard'
+    return redirect(next_url)
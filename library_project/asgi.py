@@ -3,6 +3,11 @@ ASGI config for library_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server, e.g. ``uvicorn library_project.asgi:application``,
+to enable the live admin dashboard stream at /dashboard/events/. Each open
+stream is a coroutine waiting on a queue, so idle dashboards cost no worker
+threads and no queries.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +19,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_project.settings')
 
 application = get_asgi_application()
+
+# Build the URL resolver and compile every template now, so the first
+# request each worker serves does not pay for it. With ``gunicorn --preload``
+# this runs once in the master before the workers fork.
+from library.startup import warm_up  # noqa: E402
+
+warm_up()
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_project.settings')
 
 application = get_wsgi_application()
+
+# Build the URL resolver and compile every template now, so the first
+# request each worker serves does not pay for it. With ``gunicorn --preload``
+# this runs once in the master before the workers fork.
+from library.startup import warm_up  # noqa: E402
+
+warm_up()